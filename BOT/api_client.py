@@ -0,0 +1,210 @@
+"""Bot -> Web App API uchun umumiy HTTP mijoz.
+
+Bot jarayonida bitta aiohttp.ClientSession ishlatiladi: ulanishlar pulda
+saqlanadi (keep-alive), DNS keshlanadi, har bir so'rovga aniq timeoutlar
+qo'yiladi va 5xx/ulanish xatolarida jitter bilan qayta urinib ko'riladi.
+Mijoz Application post_init da ochiladi va post_shutdown da yopiladi.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Qayta yuborish xavfsiz bo'lgan metodlar
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE'}
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, body: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class ApiClient:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        *,
+        pool_size: int = 100,
+        per_host: int = 20,
+        connect_timeout: float = 5,
+        read_timeout: float = 15,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.per_host,
+            keepalive_timeout=60,
+            ttl_dns_cache=300,
+        )
+        headers = {'X-API-Key': self.api_key} if self.api_key else {}
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=headers)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError('ApiClient ishga tushirilmagan')
+        return self._session
+
+    def _delay(self, attempt: int) -> float:
+        # "Full jitter" - bir vaqtda qayta urinayotgan so'rovlar tarqaladi
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def request(self, method: str, path: str, *, retry: Optional[bool] = None, **kwargs) -> Tuple[int, Any]:
+        """So'rov yuborish; (status, JSON yoki matn) qaytaradi"""
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        attempts = self.retries + 1 if retry else 1
+        url = f"{self.base_url}{path}"
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    metrics.observe_api(method, path, resp.status, started)
+                    if resp.status >= 500 and not last:
+                        await resp.read()
+                        logger.warning(f"API {method} {path}: {resp.status}, qayta urinish {attempt + 1}")
+                        await asyncio.sleep(self._delay(attempt))
+                        continue
+                    if resp.content_type == 'application/json':
+                        body = await resp.json()
+                    else:
+                        body = await resp.text()
+                    return resp.status, body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                metrics.observe_api(method, path, 'error', started)
+                if last:
+                    raise ApiError(f"API {method} {path} ulanish xatolik: {e!r}") from e
+                logger.warning(f"API {method} {path}: {e!r}, qayta urinish {attempt + 1}")
+                await asyncio.sleep(self._delay(attempt))
+        raise ApiError(f"API {method} {path} javob bermadi")
+
+    async def _expect(self, method: str, path: str, ok=(200,), **kwargs) -> Any:
+        status, body = await self.request(method, path, **kwargs)
+        if status not in ok:
+            raise ApiError(f"API {method} {path}: {status}", status, body)
+        return body
+
+    # --- Kontaktlar ---
+    async def contact_exists(self, user_id: int) -> bool:
+        status, body = await self.request('GET', f"/api/contacts/{user_id}")
+        if status == 200:
+            return True
+        if status == 404:
+            return False
+        raise ApiError(f"Kontaktni tekshirib bo'lmadi: {status}", status, body)
+
+    async def save_contact(self, contact: Dict[str, Any]) -> Dict[str, Any]:
+        # Server user_id bo'yicha upsert qiladi - qayta yuborish xavfsiz
+        return await self._expect('POST', '/api/contacts', json=contact, retry=True)
+
+    async def contact_ids(self, after: Optional[int] = None, limit: int = 5000, active: bool = False) -> Dict[str, Any]:
+        """Ro'yxatdan o'tgan user_id lar sahifasi: {'ids': [...], 'next': ...}"""
+        params = {'limit': limit}
+        if after:
+            params['after'] = after
+        if active:
+            params['active'] = 1
+        return await self._expect('GET', '/api/contacts/ids', params=params)
+
+    async def block_contact(self, user_id: int) -> Dict[str, Any]:
+        # Takroriy belgilash hech narsani o'zgartirmaydi - qayta yuborish xavfsiz
+        return await self._expect('POST', f"/api/contacts/{user_id}/blocked", retry=True)
+
+    # --- Mavzular ---
+    async def create_topic(self, topic: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._expect('POST', '/api/topics', json=topic)
+
+    async def delete_topic(self, topic_id: int) -> Dict[str, Any]:
+        return await self._expect('DELETE', f"/api/topics/{topic_id}")
+
+    async def list_topics(self, fields: str = 'id,title', limit: int = 50, after: Optional[str] = None):
+        params = {'fields': fields, 'limit': limit}
+        if after:
+            params['after'] = after
+        return await self._expect('GET', '/api/topics', params=params)
+
+    # --- Fayllar (bo'lakli yuklash) ---
+    async def upload_init(self, filename: str, size: int) -> Dict[str, Any]:
+        """Sessiya ochish: {'upload_id', 'offset', 'chunk_size', ...}"""
+        return await self._expect('POST', '/api/uploads', ok=(200, 201), json={'filename': filename, 'size': size})
+
+    async def upload_chunk(self, upload_id: str, offset: int, data: bytes) -> int:
+        """Bo'lakni yuborish; serverdagi yangi offsetni qaytarish"""
+        status, body = await self.request('PUT', f"/api/uploads/{upload_id}", params={'offset': offset}, data=data)
+        if status == 200:
+            return body['offset']
+        server_offset = body.get('details', {}).get('offset') if isinstance(body, dict) else None
+        if status == 409 and server_offset == offset + len(data):
+            # Oldingi urinish yozilgan, faqat javob yo'qolgan
+            return server_offset
+        raise ApiError(f"API PUT /api/uploads/{upload_id}: {status}", status, body)
+
+    async def upload_complete(self, upload_id: str, sha256: Optional[str] = None) -> Dict[str, Any]:
+        return await self._expect('POST', f"/api/uploads/{upload_id}/complete", json={'sha256': sha256})
+
+    async def upload_abort(self, upload_id: str):
+        await self.request('DELETE', f"/api/uploads/{upload_id}")
+
+    # --- Statistika ---
+    async def stats(self) -> Dict[str, Any]:
+        return await self._expect('GET', '/api/stats')
+
+
+_client: Optional[ApiClient] = None
+
+
+def get_api() -> ApiClient:
+    if _client is None:
+        raise RuntimeError('API mijoz ishga tushirilmagan (post_init)')
+    return _client
+
+
+async def start_api() -> ApiClient:
+    """Bot jarayoni uchun yagona mijozni ochish (Application post_init)"""
+    global _client
+    _client = ApiClient(
+        os.getenv('API_URL', 'http://localhost:5000'),
+        os.getenv('API_KEY'),
+        pool_size=int(os.getenv('API_POOL_SIZE', 100)),
+        per_host=int(os.getenv('API_POOL_PER_HOST', 20)),
+        connect_timeout=float(os.getenv('API_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.getenv('API_READ_TIMEOUT', 15)),
+        retries=int(os.getenv('API_RETRIES', 3)),
+    )
+    await _client.start()
+    return _client
+
+
+async def close_api():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -1,6 +1,15 @@
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 from telegram import Update
-from handlers import admin
+from handlers import admin, router
+import api_client
+from contact_cache import contact_cache
+from send_scheduler import SendScheduler
+import broadcast
+import media
+import webhook
+from persistence import create_persistence
+from error_digest import ErrorDigest
+import metrics
 import os
 from dotenv import load_dotenv
 import logging
@@ -8,6 +17,8 @@ from logging.handlers import RotatingFileHandler
 import sys
 import traceback
 import json
+import asyncio
+import time
 from datetime import datetime
 
 # Configure logging
@@ -25,59 +36,96 @@ logger = logging.getLogger(__name__)
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(dotenv_path)
 
+error_digest = None
+
 async def error_handler(update: object, context: object) -> None:
-    """Log Errors caused by Updates."""
-    error_details = {
-        'severity': 'error',
-        'timestamp': datetime.utcnow().isoformat(),
-        'message': str(context.error),
-        'update': update.to_dict() if isinstance(update, Update) else str(update),
-        'trace': ''.join(traceback.format_tb(sys.exc_info()[2]))
-    }
-    
-    logger.error(json.dumps(error_details, indent=2, ensure_ascii=False))
-    
-    # If critical error, notify admins
-    if isinstance(context.error, Exception):
-        await context.bot.send_message(
-            chat_id=os.getenv("ADMINS").split(",")[0],
-            text=f"❌ Critical error:\n{context.error}\n\nCheck logs for details."
-        )
+    """Xatoliklarni barmoq izi bo'yicha guruhlab log va adminga yuborish"""
+    if error_digest is None:
+        logger.error(f"Xatolik (digest ishga tushmagan): {context.error!r}")
+        return
+    await error_digest.report(context.error, update)
+
+background_tasks = []
+
+HEARTBEAT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'heartbeat')
+HEARTBEAT_INTERVAL = 10
+
+async def heartbeat(application: Application) -> None:
+    """Supervisor uchun: bot yangilanishlarni qabul qilayotganini fayl vaqti orqali bildirish"""
+    os.makedirs(os.path.dirname(HEARTBEAT_FILE), exist_ok=True)
+    while True:
+        updater = application.updater
+        receiving = updater is None or updater.running or os.getenv("BOT_MODE") == "webhook"
+        if application.running and receiving:
+            with open(HEARTBEAT_FILE, 'w') as f:
+                f.write(str(int(time.time())))
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+async def post_init(application: Application) -> None:
+    """Bot jarayoni uchun umumiy resurslarni ochish"""
+    global error_digest
+    error_digest = ErrorDigest(application.bot, admin.ADMINS[0] if admin.ADMINS else None)
+    background_tasks.append(asyncio.create_task(error_digest.run()))
+    api = await api_client.start_api()
+    background_tasks.append(asyncio.create_task(contact_cache.run_refresh(api)))
+    broadcast.start_broadcaster(application.bot, api)
+    await media.start_ingestor(application.bot, api)
+    background_tasks.append(asyncio.create_task(application.persistence.run_eviction(application)))
+    background_tasks.append(asyncio.create_task(heartbeat(application)))
+    metrics.start_metrics(application)
+
+async def post_shutdown(application: Application) -> None:
+    await broadcast.stop_broadcaster()
+    await media.stop_ingestor()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await api_client.close_api()
 
 async def start_bot(token: str):
     try:
-        application = Application.builder().token(token).build()
+        application = (
+            Application.builder()
+            .token(token)
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            # Usta holati qayta ishga tushishda saqlanadi, faol bo'lmaganlari TTL bilan chiqariladi
+            .persistence(create_persistence())
+            # Barcha chiquvchi Bot API so'rovlari Telegram cheklovlari bo'yicha navbatga qo'yiladi
+            .rate_limiter(SendScheduler(admin_ids=admin.ADMINS))
+            .build()
+        )
 
         # Error handler
         application.add_error_handler(error_handler)
 
         # Command handlers
-        application.add_handler(CommandHandler("start", admin.start))
+        application.add_handler(CommandHandler("start", metrics.timed(admin.start)))
+        application.add_handler(CommandHandler("broadcast", metrics.timed(admin.broadcast_command)))
 
-        # Admin handlers  
-        application.add_handler(MessageHandler(filters.Regex("^📊 Statistika$"), admin.stats_handler))
-        application.add_handler(MessageHandler(filters.Regex("^➕ Yangi mavzu qo'shish$"), admin.new_topic_button))
-        application.add_handler(MessageHandler(filters.Regex("^🗑 Mavzuni o'chirish$"), admin.delete_topic_button))
-        application.add_handler(CallbackQueryHandler(admin.delete_topic_callback, pattern=r"^delete_topic_\d+$"))
-
-        # Topic creation handlers
+        # Tugmalar, kontakt va mavzu ustasi - bitta handler, lug'at bo'yicha yo'naltirish
         application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND & ~filters.UpdateType.EDITED_MESSAGE,
-            admin.topic_text_step
+            ~filters.COMMAND & (filters.TEXT | filters.PHOTO | filters.VIDEO | filters.CONTACT),
+            router.dispatch
         ))
-        application.add_handler(MessageHandler(filters.PHOTO, admin.photo_handler_topic))
-        application.add_handler(MessageHandler(filters.VIDEO, admin.video_handler_topic))
-        application.add_handler(MessageHandler(filters.Regex("^⏭ O'tkazib yuborish$"), admin.skip_handler))
-        application.add_handler(MessageHandler(filters.Regex("^✅ Saqlash$"), admin.save_topic_handler))
-
-        # User handlers
-        application.add_handler(MessageHandler(filters.CONTACT, admin.contact_handler))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, admin.video_handler))
-        application.add_handler(MessageHandler(filters.PHOTO, admin.photo_handler))
-        application.add_handler(MessageHandler(filters.VIDEO, admin.video_handler))
+        application.add_handler(CallbackQueryHandler(metrics.timed(admin.delete_topic_callback), pattern=r"^delete_topic_\d+$"))
 
         logger.info("Bot started successfully")
-        await application.run_polling(allowed_updates=Update.ALL_TYPES)
+        allowed_updates = webhook.allowed_updates(application)
+        if os.getenv("BOT_MODE", "polling") == "webhook":
+            await webhook.run_webhook(
+                application,
+                url=os.environ["WEBHOOK_URL"],
+                listen=os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+                port=int(os.getenv("WEBHOOK_PORT", 8443)),
+                path=os.getenv("WEBHOOK_PATH", "/telegram"),
+                secret=os.getenv("WEBHOOK_SECRET") or webhook.default_secret(token),
+                max_connections=int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40)),
+            )
+        else:
+            # Polling webhookni o'chiradi, shuning uchun rejimlar orasida almashish xavfsiz
+            await application.run_polling(allowed_updates=allowed_updates)
         
     except Exception as e:
         error_details = {
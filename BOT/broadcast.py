@@ -0,0 +1,337 @@
+"""Barcha ro'yxatdan o'tgan foydalanuvchilarga ommaviy xabar yuborish.
+
+Kontaktlar /api/contacts/ids dan keyset sahifalar bilan oqim tarzida olinadi
+(botni bloklaganlar chiqarib tashlanadi) va cheklangan sondagi workerlar
+orqali yuboriladi. Tezlik SendScheduler tomonidan Telegram cheklovlari
+bo'yicha boshqariladi - ommaviy xabarlar PRIORITY_BULK navbatida, admin
+javoblaridan keyin beriladi.
+
+Har bir oluvchining holati BOT/data/broadcast.db (sqlite) da saqlanadi:
+bot qulasa yoki qayta ishga tushsa, tugallanmagan yuborish oxirgi sahifadan
+davom etadi va allaqachon yuborilganlarga qayta yuborilmaydi. Botni
+bloklagan foydalanuvchi web API da belgilanadi va keyingi safar o'tkazib
+yuboriladi. Jarayon admin chatidagi xabarda jonli ko'rsatiladi.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from send_scheduler import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DB_PATH = os.getenv('BROADCAST_DB', os.path.join(DATA_DIR, 'broadcast.db'))
+WORKERS = int(os.getenv('BROADCAST_WORKERS', 30))
+PAGE_SIZE = 1000
+# Shuncha natija to'planganda bazaga yoziladi (qulashda ko'pi bilan shuncha takror)
+FLUSH_EVERY = 50
+PROGRESS_INTERVAL = 5
+# Tugagan yuborishlar holati shuncha kundan keyin o'chiriladi
+KEEP_DAYS = 30
+
+SENT = 'sent'
+BLOCKED = 'blocked'
+FAILED = 'failed'
+
+RUNNING = 'running'
+DONE = 'done'
+
+
+class BroadcastStore:
+    """Yuborishlar va har bir oluvchi holati (sqlite, WAL)"""
+
+    def __init__(self, path: str = DB_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                admin_chat_id INTEGER,
+                progress_message_id INTEGER,
+                status TEXT NOT NULL,
+                cursor INTEGER,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS deliveries (
+                broadcast_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                PRIMARY KEY (broadcast_id, user_id)
+            ) WITHOUT ROWID;
+        ''')
+        self.conn.commit()
+
+    def create(self, payload: Dict[str, Any], admin_chat_id: Optional[int]) -> int:
+        cur = self.conn.execute(
+            'INSERT INTO broadcasts (payload, admin_chat_id, status, created_at) VALUES (?, ?, ?, ?)',
+            (json.dumps(payload, ensure_ascii=False), admin_chat_id, RUNNING, time.time()),
+        )
+        self.conn.commit()
+        return cur.lastrowid
+
+    def get(self, broadcast_id: int) -> sqlite3.Row:
+        return self.conn.execute('SELECT * FROM broadcasts WHERE id = ?', (broadcast_id,)).fetchone()
+
+    def unfinished(self) -> List[int]:
+        rows = self.conn.execute('SELECT id FROM broadcasts WHERE status = ? ORDER BY id', (RUNNING,))
+        return [row['id'] for row in rows]
+
+    def set_progress_message(self, broadcast_id: int, message_id: int):
+        self.conn.execute('UPDATE broadcasts SET progress_message_id = ? WHERE id = ?', (message_id, broadcast_id))
+        self.conn.commit()
+
+    def set_cursor(self, broadcast_id: int, cursor: Optional[int]):
+        self.conn.execute('UPDATE broadcasts SET cursor = ? WHERE id = ?', (cursor, broadcast_id))
+        self.conn.commit()
+
+    def finish(self, broadcast_id: int):
+        self.conn.execute(
+            'UPDATE broadcasts SET status = ?, finished_at = ? WHERE id = ?',
+            (DONE, time.time(), broadcast_id),
+        )
+        self.conn.commit()
+
+    def delivered(self, broadcast_id: int, user_ids: Iterable[int]) -> set:
+        """Sahifadagi allaqachon natijasi yozilgan oluvchilar"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        # Sahifa bitta diapazon - IN ro'yxati o'rniga BETWEEN
+        rows = self.conn.execute(
+            'SELECT user_id FROM deliveries WHERE broadcast_id = ? AND user_id BETWEEN ? AND ?',
+            (broadcast_id, min(user_ids), max(user_ids)),
+        )
+        return {row['user_id'] for row in rows}
+
+    def record(self, broadcast_id: int, results: List[Tuple[int, str, Optional[str]]]):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO deliveries (broadcast_id, user_id, status, error) VALUES (?, ?, ?, ?)',
+            [(broadcast_id, user_id, status, error) for user_id, status, error in results],
+        )
+        self.conn.commit()
+
+    def counts(self, broadcast_id: int) -> Dict[str, int]:
+        rows = self.conn.execute(
+            'SELECT status, COUNT(*) AS n FROM deliveries WHERE broadcast_id = ? GROUP BY status',
+            (broadcast_id,),
+        )
+        counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        return counts
+
+    def prune(self, days: int = KEEP_DAYS):
+        cutoff = time.time() - days * 86400
+        old = [row['id'] for row in self.conn.execute(
+            'SELECT id FROM broadcasts WHERE status = ? AND finished_at < ?', (DONE, cutoff))]
+        if old:
+            self.conn.executemany('DELETE FROM deliveries WHERE broadcast_id = ?', [(i,) for i in old])
+            self.conn.executemany('DELETE FROM broadcasts WHERE id = ?', [(i,) for i in old])
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class _Run:
+    """Bitta yuborishning xotiradagi holati"""
+
+    def __init__(self, broadcast_id: int, row: sqlite3.Row, counts: Dict[str, int]):
+        self.id = broadcast_id
+        self.payload = json.loads(row['payload'])
+        self.admin_chat_id = row['admin_chat_id']
+        self.progress_message_id = row['progress_message_id']
+        self.cursor = row['cursor']
+        self.counts = counts
+        self.pending: List[Tuple[int, str, Optional[str]]] = []
+        self.started = time.monotonic()
+        self.last_progress = 0.0
+
+
+class Broadcaster:
+    def __init__(self, bot, api, store: BroadcastStore, workers: int = WORKERS):
+        self.bot = bot
+        self.api = api
+        self.store = store
+        self.workers = workers
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def start(self, text: str, admin_chat_id: Optional[int] = None, web_app_url: Optional[str] = None) -> int:
+        """Yangi ommaviy yuborishni boshlash; ID sini qaytaradi"""
+        payload = {'text': text, 'web_app_url': web_app_url}
+        broadcast_id = self.store.create(payload, admin_chat_id)
+        if admin_chat_id is not None:
+            try:
+                message = await self.bot.send_message(admin_chat_id, f"📣 Yuborish #{broadcast_id} boshlandi...")
+                self.store.set_progress_message(broadcast_id, message.message_id)
+            except TelegramError as e:
+                logger.warning(f"Broadcast #{broadcast_id}: admin xabarini yuborib bo'lmadi: {e}")
+        self._spawn(broadcast_id)
+        return broadcast_id
+
+    def resume(self):
+        """Bot qayta ishga tushganda tugallanmagan yuborishlarni davom ettirish"""
+        self.store.prune()
+        for broadcast_id in self.store.unfinished():
+            logger.info(f"Broadcast #{broadcast_id} davom ettirilmoqda")
+            self._spawn(broadcast_id)
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def _spawn(self, broadcast_id: int):
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    def _reply_markup(self, run: _Run):
+        url = run.payload.get('web_app_url')
+        if not url:
+            return None
+        return InlineKeyboardMarkup([[InlineKeyboardButton("🌐 Web App", web_app=WebAppInfo(url=url))]])
+
+    async def _run(self, broadcast_id: int):
+        run = _Run(broadcast_id, self.store.get(broadcast_id), self.store.counts(broadcast_id))
+        reply_markup = self._reply_markup(run)
+        try:
+            while True:
+                page = await self.api.contact_ids(after=run.cursor, limit=PAGE_SIZE, active=True)
+                done = self.store.delivered(run.id, page['ids'])
+                queue: asyncio.Queue = asyncio.Queue()
+                for user_id in page['ids']:
+                    if user_id not in done:
+                        queue.put_nowait(user_id)
+                workers = [
+                    asyncio.create_task(self._worker(run, queue, reply_markup))
+                    for _ in range(min(self.workers, queue.qsize()))
+                ]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    self._flush(run)
+                # Sahifa to'liq yozilgandan keyingina kursor suriladi
+                run.cursor = page.get('next')
+                if not run.cursor:
+                    break
+                self.store.set_cursor(run.id, run.cursor)
+                await self._progress(run)
+            self.store.finish(run.id)
+            await self._progress(run, finished=True)
+            logger.info(f"Broadcast #{run.id} tugadi: {run.counts}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Holat saqlangan - keyingi ishga tushishda davom etadi
+            logger.error(f"Broadcast #{run.id} to'xtadi: {e}")
+            await self._notify(run, f"⚠️ Yuborish #{run.id} to'xtadi: {e}\nBot qayta ishga tushganda davom etadi.")
+
+    async def _worker(self, run: _Run, queue: asyncio.Queue, reply_markup):
+        while not queue.empty():
+            user_id = queue.get_nowait()
+            status, error = await self._deliver(user_id, run.payload['text'], reply_markup)
+            run.counts[status] += 1
+            run.pending.append((user_id, status, error))
+            if len(run.pending) >= FLUSH_EVERY:
+                self._flush(run)
+            if time.monotonic() - run.last_progress >= PROGRESS_INTERVAL:
+                await self._progress(run)
+
+    async def _deliver(self, user_id: int, text: str, reply_markup) -> Tuple[str, Optional[str]]:
+        try:
+            await self.bot.send_message(
+                user_id, text, reply_markup=reply_markup,
+                rate_limit_args={'priority': PRIORITY_BULK},
+            )
+            return SENT, None
+        except Forbidden as e:
+            # Foydalanuvchi botni bloklagan yoki o'chirilgan
+            try:
+                await self.api.block_contact(user_id)
+            except Exception as api_error:
+                logger.warning(f"Bloklanganni belgilab bo'lmadi {user_id}: {api_error}")
+            return BLOCKED, str(e)
+        except (BadRequest, RetryAfter) as e:
+            return FAILED, str(e)
+        except TelegramError as e:
+            logger.warning(f"Broadcast {user_id}: {e}")
+            return FAILED, str(e)
+
+    def _flush(self, run: _Run):
+        if run.pending:
+            # Kichik partiya, WAL rejimida yozish millisekundlar oladi
+            self.store.record(run.id, run.pending)
+            run.pending = []
+
+    async def _progress(self, run: _Run, finished: bool = False):
+        run.last_progress = time.monotonic()
+        counts = run.counts
+        elapsed = int(run.last_progress - run.started)
+        title = f"✅ Yuborish #{run.id} tugadi" if finished else f"📣 Yuborish #{run.id} davom etmoqda"
+        text = (
+            f"{title}\n"
+            f"Yuborildi: {counts[SENT]}\n"
+            f"Bloklagan: {counts[BLOCKED]}\n"
+            f"Xatolik: {counts[FAILED]}\n"
+            f"Vaqt: {elapsed} s"
+        )
+        await self._notify(run, text)
+
+    async def _notify(self, run: _Run, text: str):
+        if run.admin_chat_id is None:
+            return
+        try:
+            if run.progress_message_id:
+                await self.bot.edit_message_text(text, chat_id=run.admin_chat_id, message_id=run.progress_message_id)
+            else:
+                await self.bot.send_message(run.admin_chat_id, text)
+        except BadRequest as e:
+            # "message is not modified" - matn o'zgarmagan
+            if 'not modified' not in str(e):
+                logger.warning(f"Broadcast #{run.id} progress: {e}")
+        except TelegramError as e:
+            logger.warning(f"Broadcast #{run.id} progress: {e}")
+
+
+_broadcaster: Optional[Broadcaster] = None
+
+
+def get_broadcaster() -> Broadcaster:
+    if _broadcaster is None:
+        raise RuntimeError('Broadcaster ishga tushirilmagan (post_init)')
+    return _broadcaster
+
+
+def start_broadcaster(bot, api) -> Broadcaster:
+    """Application post_init: holatlar bazasini ochish va tugallanmaganlarni davom ettirish"""
+    global _broadcaster
+    _broadcaster = Broadcaster(bot, api, BroadcastStore())
+    _broadcaster.resume()
+    return _broadcaster
+
+
+async def stop_broadcaster():
+    global _broadcaster
+    if _broadcaster is not None:
+        await _broadcaster.stop()
+        _broadcaster.store.close()
+        _broadcaster = None
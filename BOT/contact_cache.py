@@ -0,0 +1,122 @@
+"""Ro'yxatdan o'tgan foydalanuvchilar keshi.
+
+/start bosilganda qaysi klaviaturani ko'rsatish uchun web API ga murojaat
+qilmaslik maqsadida bot ro'yxatdan o'tgan user_id larni xotirada saqlaydi:
+
+- snapshot: ishga tushganda /api/contacts/ids dan sahifalab olinadigan
+  tartiblangan array('q') (har bir ID 8 bayt, qidiruv bisect bilan);
+- recent: snapshotdan keyin saqlangan kontaktlar (cheklangan LRU);
+- negative: topilmagan ID lar qisqa muddat saqlanadi, keyin yana tekshiriladi.
+
+Kontaktlar o'chirilmaydi, shuning uchun ijobiy yozuvlar uzoq yashaydi va
+snapshot CONTACT_CACHE_TTL muddati tugashidan oldin yangilab turiladi.
+"""
+import asyncio
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+POSITIVE_TTL = int(os.getenv('CONTACT_CACHE_TTL', 6 * 3600))
+NEGATIVE_TTL = int(os.getenv('CONTACT_CACHE_NEGATIVE_TTL', 60))
+MAX_RECENT = 50000
+MAX_NEGATIVE = 10000
+WARM_PAGE_SIZE = 5000
+
+
+class ContactCache:
+    def __init__(self, positive_ttl: int = POSITIVE_TTL, negative_ttl: int = NEGATIVE_TTL,
+                 max_recent: int = MAX_RECENT, max_negative: int = MAX_NEGATIVE):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_recent = max_recent
+        self.max_negative = max_negative
+        self._snapshot = array('q')
+        self._snapshot_expires = 0.0
+        self._recent: 'OrderedDict[int, float]' = OrderedDict()
+        self._negative: 'OrderedDict[int, float]' = OrderedDict()
+
+    def _in_snapshot(self, user_id: int) -> bool:
+        i = bisect_left(self._snapshot, user_id)
+        return i < len(self._snapshot) and self._snapshot[i] == user_id
+
+    def get(self, user_id: int) -> Optional[bool]:
+        """True - ro'yxatdan o'tgan, False - yaqinda topilmagan, None - noma'lum"""
+        now = time.monotonic()
+        expires = self._recent.get(user_id)
+        if expires is not None:
+            if expires > now:
+                self._recent.move_to_end(user_id)
+                return True
+            del self._recent[user_id]
+        if self._snapshot_expires > now and self._in_snapshot(user_id):
+            return True
+        expires = self._negative.get(user_id)
+        if expires is not None:
+            if expires > now:
+                return False
+            del self._negative[user_id]
+        return None
+
+    def add(self, user_id: int):
+        """Kontakt saqlanganda darhol ijobiy yozuv qo'shish"""
+        self._negative.pop(user_id, None)
+        self._recent[user_id] = time.monotonic() + self.positive_ttl
+        self._recent.move_to_end(user_id)
+        while len(self._recent) > self.max_recent:
+            self._recent.popitem(last=False)
+
+    def mark_missing(self, user_id: int):
+        self._negative[user_id] = time.monotonic() + self.negative_ttl
+        self._negative.move_to_end(user_id)
+        while len(self._negative) > self.max_negative:
+            self._negative.popitem(last=False)
+
+    def set(self, user_id: int, exists: bool):
+        if exists:
+            self.add(user_id)
+        else:
+            self.mark_missing(user_id)
+
+    def load_snapshot(self, ids):
+        snapshot = array('q', sorted(ids))
+        self._snapshot = snapshot
+        self._snapshot_expires = time.monotonic() + self.positive_ttl
+        # Snapshotga tushganlarni recent dan chiqarib, xotirani bo'shatamiz
+        for user_id in [u for u in self._recent if self._in_snapshot(u)]:
+            del self._recent[user_id]
+
+    async def warm(self, api):
+        """Barcha ro'yxatdan o'tgan ID larni sahifalab yuklash"""
+        ids = array('q')
+        after = None
+        while True:
+            page = await api.contact_ids(after=after, limit=WARM_PAGE_SIZE)
+            ids.extend(page['ids'])
+            after = page.get('next')
+            if not after:
+                break
+        self.load_snapshot(ids)
+        logger.info(f"Kontaktlar keshi yangilandi: {len(ids)} ta")
+
+    async def run_refresh(self, api):
+        """Ishga tushganda va keyin davriy ravishda snapshotni yangilash"""
+        while True:
+            try:
+                await self.warm(api)
+                # Snapshot muddati tugashidan oldin yangilanadi
+                delay = self.positive_ttl / 2
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Kontaktlar keshini yuklashda xatolik: {e}")
+                delay = 60
+            await asyncio.sleep(delay)
+
+
+contact_cache = ContactCache()
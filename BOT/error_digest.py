@@ -0,0 +1,152 @@
+"""Xatoliklarni guruhlab adminga yuborish.
+
+Har bir xatolik turi va eng ichki kadrlari bo'yicha barmoq izi (fingerprint)
+hisoblanadi. Yangi barmoq izi uchun admin darhol xabar oladi va to'liq
+tafsilot logga bir marta yoziladi; oyna (ERROR_WINDOW) ichidagi takrorlar
+faqat sanaladi va ERROR_DIGEST_INTERVAL da bitta umumiy xabar bilan
+yuboriladi. Admin xabarlari o'z token bucketi bilan cheklangan - limitdan
+oshgan ogohlantirishlar ham umumiy xabarga tushadi. Shu tariqa web ilova
+ishlamay qolganda admin chatiga yuzlab xabar ketmaydi.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import traceback
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Optional
+
+from telegram import Update
+from telegram.error import TelegramError
+
+from send_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+WINDOW = int(os.getenv('ERROR_WINDOW', 600))
+DIGEST_INTERVAL = int(os.getenv('ERROR_DIGEST_INTERVAL', 300))
+# Admin xabarlari: daqiqasiga ALERT_RATE ta, ketma-ket ALERT_BURST tagacha
+ALERT_RATE = 5 / 60
+ALERT_BURST = 3
+# Barmoq izida ishlatiladigan eng ichki kadrlar soni
+FINGERPRINT_FRAMES = 3
+MAX_FINGERPRINTS = 500
+MAX_MESSAGE_LENGTH = 200
+
+
+def fingerprint(error: BaseException) -> str:
+    """Xatolik turi va eng ichki kadrlar (fayl, funksiya) bo'yicha qisqa xesh"""
+    frames = traceback.extract_tb(error.__traceback__)[-FINGERPRINT_FRAMES:]
+    parts = [f"{type(error).__module__}.{type(error).__qualname__}"]
+    # Qator raqami kiritilmaydi - kod tahrirlanganda barmoq izi o'zgarmasin
+    parts.extend(f"{os.path.basename(frame.filename)}:{frame.name}" for frame in frames)
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:8]
+
+
+class _Entry:
+    __slots__ = ('title', 'first_seen', 'last_seen', 'times', 'logged_at', 'unreported')
+
+    def __init__(self, title: str, now: float):
+        self.title = title
+        self.first_seen = now
+        self.last_seen = now
+        self.times = deque()
+        self.logged_at = 0.0
+        # Oxirgi xabardan beri adminga bildirilmagan takrorlar
+        self.unreported = 0
+
+
+class ErrorDigest:
+    def __init__(self, bot, admin_chat_id: Optional[int], window: int = WINDOW,
+                 digest_interval: int = DIGEST_INTERVAL):
+        self.bot = bot
+        self.admin_chat_id = admin_chat_id
+        self.window = window
+        self.digest_interval = digest_interval
+        self._alerts = TokenBucket(ALERT_RATE, ALERT_BURST)
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        for fp in [fp for fp, e in self._entries.items() if e.last_seen < cutoff and not e.unreported]:
+            del self._entries[fp]
+        while len(self._entries) > MAX_FINGERPRINTS:
+            self._entries.popitem(last=False)
+
+    async def report(self, error: BaseException, update: object = None):
+        """error_handler dan chaqiriladi"""
+        now = time.monotonic()
+        fp = fingerprint(error)
+        entry = self._entries.get(fp)
+        is_new = entry is None or entry.last_seen < now - self.window
+        if entry is None:
+            message = str(error)[:MAX_MESSAGE_LENGTH]
+            entry = _Entry(f"{type(error).__name__}: {message}", now)
+            self._entries[fp] = entry
+        self._entries.move_to_end(fp)
+        entry.last_seen = now
+        entry.times.append(now)
+        while entry.times and entry.times[0] < now - self.window:
+            entry.times.popleft()
+
+        if now - entry.logged_at >= self.window:
+            entry.logged_at = now
+            logger.error(json.dumps({
+                'severity': 'error',
+                'fingerprint': fp,
+                'timestamp': datetime.utcnow().isoformat(),
+                'message': str(error),
+                'update': update.to_dict() if isinstance(update, Update) else str(update),
+                'trace': ''.join(traceback.format_exception(type(error), error, error.__traceback__)),
+            }, ensure_ascii=False))
+        else:
+            logger.debug(f"Takroriy xatolik [{fp}] ({len(entry.times)} marta oynada)")
+
+        if is_new and self._take_alert(now):
+            await self._send(f"❌ Yangi xatolik [{fp}]\n{entry.title}\n\nTafsilotlar logda.")
+        else:
+            entry.unreported += 1
+
+    def _take_alert(self, now: float) -> bool:
+        if self._alerts.delay(now) > 0:
+            return False
+        self._alerts.take(now)
+        return True
+
+    def digest(self) -> Optional[str]:
+        """Bildirilmagan takrorlar bo'yicha umumiy matn (yo'q bo'lsa None)"""
+        now = time.monotonic()
+        lines = []
+        for fp, entry in sorted(self._entries.items(), key=lambda item: -item[1].unreported):
+            if not entry.unreported:
+                continue
+            lines.append(f"• [{fp}] {entry.title} — +{entry.unreported} ({len(entry.times)} marta oxirgi {self.window // 60} daqiqada)")
+            entry.unreported = 0
+        self._expire(now)
+        if not lines:
+            return None
+        return "🔁 Takrorlangan xatoliklar:\n" + "\n".join(lines)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            try:
+                text = self.digest()
+                if text:
+                    logger.warning(text)
+                    await self._send(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Xatoliklar digestini yuborib bo'lmadi: {e}")
+
+    async def _send(self, text: str):
+        if self.admin_chat_id is None:
+            return
+        try:
+            await self.bot.send_message(self.admin_chat_id, text[:4096])
+        except TelegramError as e:
+            logger.warning(f"Adminga xatolik xabarini yuborib bo'lmadi: {e}")
@@ -1,17 +1,18 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo, KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
-import aiohttp
 import os
 import logging
 from logging.handlers import RotatingFileHandler
 from typing import Optional, Dict, Any
 import re
 import json
-from functools import wraps
 import traceback
 import asyncio
-import time
 from datetime import datetime, timedelta
+from api_client import get_api, ApiError
+from contact_cache import contact_cache
+from broadcast import get_broadcaster
+from media import BOT_API_DOWNLOAD_LIMIT, get_ingestor
 
 # Log yozish sozlamalari
 if not os.path.exists('logs'):
@@ -29,9 +30,10 @@ logger = logging.getLogger(__name__)
 
 # Sozlamalar
 ADMINS = [int(x) for x in os.getenv("ADMINS", "").split(",") if x.strip()]
-API_URL = os.getenv("API_URL", "http://localhost:5000")
 WEBAPP_URL = os.getenv("WEBAPP_URL", "http://localhost:5000")
 API_KEY = os.getenv("API_KEY")
+# Yangi mavzu saqlanganda barcha foydalanuvchilarga xabar yuborish (ixtiyoriy, NOTIFY_NEW_TOPICS=1 bilan yoqiladi)
+NOTIFY_NEW_TOPICS = os.getenv("NOTIFY_NEW_TOPICS", "0") == "1"
 
 # Rasm formatlari
 ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/gif']
@@ -43,6 +45,7 @@ MAX_VIDEO_SIZE = 50 * 1024 * 1024  # 50MB
 
 # --- Yangi mavzu qo'shish uchun tugmalar ---
 NEW_TOPIC_BTN = "➕ Yangi mavzu qo'shish"
+STATS_BTN = "📊 Statistika"
 SKIP_BTN = "⏭ O'tkazib yuborish"
 CANCEL_BTN = "❌ Bekor qilish"
 SAVE_BTN = "✅ Saqlash"
@@ -50,52 +53,6 @@ DELETE_TOPIC_BTN = "🗑 Mavzuni o'chirish"
 
 TOPIC_STEPS = ['title', 'structure', 'examples', 'image', 'video']
 
-# Rate limiting settings
-RATE_LIMIT = 30  # max requests per second
-RATE_WINDOW = 1  # seconds
-RETRY_COUNT = 3
-RETRY_DELAY = 1  # seconds
-
-class RateLimiter:
-    def __init__(self, rate=RATE_LIMIT, per=RATE_WINDOW):
-        self.rate = rate
-        self.per = per
-        self.allowance = rate
-        self.last_check = time.time()
-
-    def is_allowed(self):
-        current = time.time()
-        time_passed = current - self.last_check
-        self.last_check = current
-        self.allowance += time_passed * (self.rate / self.per)
-        
-        if self.allowance > self.rate:
-            self.allowance = self.rate
-            
-        if self.allowance < 1:
-            return False
-            
-        self.allowance -= 1
-        return True
-
-rate_limiter = RateLimiter()
-
-def handle_rate_limit(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        for attempt in range(RETRY_COUNT):
-            if rate_limiter.is_allowed():
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    if "Too Many Requests" in str(e) and attempt < RETRY_COUNT - 1:
-                        await asyncio.sleep(RETRY_DELAY * (attempt + 1))
-                        continue
-                    raise
-            await asyncio.sleep(RETRY_DELAY)
-        return await func(*args, **kwargs)
-    return wrapper
-
 def is_admin(user_id: int) -> bool:
     """Admin tekshiruv"""
     return user_id in ADMINS
@@ -124,55 +81,39 @@ def validate_youtube_url(url: str) -> bool:
     )
     return bool(youtube_pattern.match(url))
 
-async def handle_error(update: Update, context: ContextTypes.DEFAULT_TYPE, error: Exception):
-    """Xatoliklarni boshqarish"""
-    logger.error(f"Xatolik yuz berdi: {str(error)}")
-    logger.error(traceback.format_exc())
-    
-    # Asosiy menyuga qaytish
+def admin_menu_markup() -> ReplyKeyboardMarkup:
+    """Admin asosiy menyusi"""
     keyboard = [
         [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-        [KeyboardButton("📊 Statistika")],
+        [KeyboardButton(STATS_BTN)],
         [KeyboardButton(NEW_TOPIC_BTN)],
         [KeyboardButton(DELETE_TOPIC_BTN)]
     ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-    
-    error_message = "Xatolik yuz berdi. Iltimos, keyinroq qaytadan urinib ko'ring."
-    if update.effective_message:
-        await update.effective_message.reply_text(error_message, reply_markup=reply_markup)
-    elif update.callback_query:
-        await update.callback_query.message.reply_text(error_message, reply_markup=reply_markup)
-
-@handle_rate_limit
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start buyrug'i"""
     try:
         user_id = update.message.from_user.id
         if is_admin(user_id):
-            keyboard = [
-                [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-                [KeyboardButton("📊 Statistika")],
-                [KeyboardButton(NEW_TOPIC_BTN)],
-                [KeyboardButton(DELETE_TOPIC_BTN)]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
             await update.message.reply_text(
                 "Admin panelga xush kelibsiz! Yangi mavzu qo'shish yoki o'chirish uchun tugmani bosing.",
-                reply_markup=reply_markup
+                reply_markup=admin_menu_markup()
             )
         else:
-            # Foydalanuvchini bazadan tekshirish
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{API_URL}/api/contacts/{user_id}") as resp:
-                    if resp.status == 200:
-                        keyboard = [[KeyboardButton("🌐 Web App", web_app=WebAppInfo(url=WEBAPP_URL))]]
-                        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-                        await update.message.reply_text(
-                            "Xush kelibsiz! Mavzularni ko'rish uchun Web App tugmasini bosing:",
-                            reply_markup=reply_markup
-                        )
-                        return
+            # Foydalanuvchini avval keshdan, bo'lmasa bazadan tekshirish
+            registered = contact_cache.get(user_id)
+            if registered is None:
+                registered = await get_api().contact_exists(user_id)
+                contact_cache.set(user_id, registered)
+            if registered:
+                keyboard = [[KeyboardButton("🌐 Web App", web_app=WebAppInfo(url=WEBAPP_URL))]]
+                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+                await update.message.reply_text(
+                    "Xush kelibsiz! Mavzularni ko'rish uchun Web App tugmasini bosing:",
+                    reply_markup=reply_markup
+                )
+                return
             keyboard = [[KeyboardButton("📱 Contact yuborish", request_contact=True)]]
             reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
             await update.message.reply_text(
@@ -183,10 +124,33 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Start xatolik: {e}")
         await update.message.reply_text("Xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.")
 
-@handle_rate_limit
+async def contact_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Foydalanuvchi kontaktini saqlash"""
+    try:
+        contact = update.message.contact
+        user_id = update.message.from_user.id
+        if contact.user_id and contact.user_id != user_id:
+            await update.message.reply_text("Iltimos, o'zingizning kontaktingizni yuboring.")
+            return
+        await get_api().save_contact({
+            'user_id': user_id,
+            'first_name': contact.first_name,
+            'last_name': contact.last_name,
+            'phone_number': contact.phone_number
+        })
+        contact_cache.add(user_id)
+        keyboard = [[KeyboardButton("🌐 Web App", web_app=WebAppInfo(url=WEBAPP_URL))]]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        await update.message.reply_text(
+            "Rahmat! Mavzularni ko'rish uchun Web App tugmasini bosing:",
+            reply_markup=reply_markup
+        )
+    except Exception as e:
+        logger.error(f"Contact saqlash xatolik: {e}")
+        await update.message.reply_text("Xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.")
+
 async def new_topic_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info("Yangi mavzu tugmasi bosildi")
-    print("Yangi mavzu tugmasi bosildi")
     if not is_admin(update.message.from_user.id):
         return
     context.user_data['topic'] = {}
@@ -240,284 +204,213 @@ async def ask_next_topic_step(update, context):
         await update.message.reply_text(message, reply_markup=reply_markup)
 
     except Exception as e:
-        logger.error(f"ask_next_topic_step xatolik: {e}")
         # Xatolik yuz berganda asosiy menyuga qaytish
-        keyboard = [
-            [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-            [KeyboardButton("📊 Statistika")],
-            [KeyboardButton(NEW_TOPIC_BTN)],
-            [KeyboardButton(DELETE_TOPIC_BTN)]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        await topic_wizard_error(update, context, e)
+
+# --- Mavzu yaratish ustasi: holatlar ---
+# Holat - TOPIC_STEPS dagi bosqich yoki barcha bosqichlardan keyin CONFIRM_STATE.
+# Har bir holat uchun handlerlar handlers/router.py dagi jadvalda.
+CONFIRM_STATE = 'confirm'
+# O'tkazib yuborish mumkin bo'lgan bosqichlar va ular to'ldiradigan maydon
+SKIPPABLE_FIELDS = {'image': 'image_url', 'video': 'video_url'}
+
+def topic_state(user_data: Dict[str, Any]) -> Optional[str]:
+    """Ustaning joriy holati; foydalanuvchi ustada bo'lmasa None"""
+    step_idx = user_data.get('topic_step')
+    if step_idx is None:
+        return None
+    return TOPIC_STEPS[step_idx] if step_idx < len(TOPIC_STEPS) else CONFIRM_STATE
+
+def clear_topic_wizard(context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.pop('topic', None)
+    context.user_data.pop('topic_step', None)
+
+async def advance_topic(update: Update, context: ContextTypes.DEFAULT_TYPE, field: str, value):
+    """Maydonni saqlab keyingi bosqichga o'tish"""
+    context.user_data['topic'][field] = value
+    context.user_data['topic_step'] += 1
+    await ask_next_topic_step(update, context)
+
+async def topic_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """title/structure/examples bosqichlarida matn"""
+    text = update.message.text
+    if not validate_text(text):
         await update.message.reply_text(
-            "Xatolik yuz berdi. Asosiy menyuga qaytdingiz.",
-            reply_markup=reply_markup
+            "Matn noto'g'ri formatda. Iltimos, qaytadan kiriting:",
+            reply_markup=ReplyKeyboardMarkup([[KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
         )
-        context.user_data.pop('topic', None)
-        context.user_data.pop('topic_step', None)
+        return
+    await advance_topic(update, context, topic_state(context.user_data), text)
 
-@handle_rate_limit
-async def topic_text_step(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        if not is_admin(update.message.from_user.id):
-            return
+async def topic_photo_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    photo = update.message.photo[-1]
+    if photo.file_size > MAX_IMAGE_SIZE:
+        await update.message.reply_text(f"Rasm hajmi {MAX_IMAGE_SIZE/1024/1024}MB dan oshmasligi kerak.")
+        return
+    # Fayl fonda web omborga ko'chiriladi, usta kutmasdan davom etadi
+    get_ingestor().submit(photo.file_id)
+    await advance_topic(update, context, 'image_file_id', photo.file_id)
+
+async def topic_video_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    video = update.message.video
+    if video.file_size > MAX_VIDEO_SIZE:
+        await update.message.reply_text(f"Video hajmi {MAX_VIDEO_SIZE/1024/1024}MB dan oshmasligi kerak.")
+        return
+    if video.file_size > BOT_API_DOWNLOAD_LIMIT:
+        await update.message.reply_text(
+            f"Bot {BOT_API_DOWNLOAD_LIMIT/1024/1024:.0f}MB dan katta videoni yuklab ololmaydi. "
+            "Iltimos, video havolasini yuboring."
+        )
+        return
+    get_ingestor().submit(video.file_id)
+    await advance_topic(update, context, 'video_file_id', video.file_id)
 
-        if 'topic_step' not in context.user_data:
-            return
+async def topic_video_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text
+    if validate_youtube_url(text) or validate_url(text):
+        await advance_topic(update, context, 'video_url', text)
+        return
+    await update.message.reply_text(
+        "Noto'g'ri video havolasi. Iltimos, to'g'ri havola kiriting yoki o'tkazib yuborish tugmasini bosing:",
+        reply_markup=ReplyKeyboardMarkup([[KeyboardButton(SKIP_BTN)], [KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
+    )
 
-        step_idx = context.user_data['topic_step']
-        text = update.message.text
+async def topic_skip(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    step = topic_state(context.user_data)
+    logger.info(f"{step} bosqichi o'tkazib yuborildi")
+    await advance_topic(update, context, SKIPPABLE_FIELDS[step], None)
 
-        # Cancel tugmasi bosilganda
-        if text == CANCEL_BTN:
-            # Barcha ma'lumotlarni tozalash
-            context.user_data.pop('topic', None)
-            context.user_data.pop('topic_step', None)
-            
-            # Asosiy menyuga qaytish
-            keyboard = [
-                [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-                [KeyboardButton("📊 Statistika")],
-                [KeyboardButton(NEW_TOPIC_BTN)],
-                [KeyboardButton(DELETE_TOPIC_BTN)]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-            await update.message.reply_text(
-                "Mavzu yaratish bekor qilindi. Asosiy menyuga qaytdingiz.",
-                reply_markup=reply_markup
-            )
-            return
+async def topic_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    clear_topic_wizard(context)
+    await update.message.reply_text(
+        "Mavzu yaratish bekor qilindi. Asosiy menyuga qaytdingiz.",
+        reply_markup=admin_menu_markup()
+    )
 
-        # Save tugmasi bosilganda
-        if text == SAVE_BTN and step_idx >= len(TOPIC_STEPS):
-            await save_topic_handler(update, context)
-            return
+async def topic_wizard_error(update: Update, context: ContextTypes.DEFAULT_TYPE, error: Exception):
+    """Usta bosqichidagi xatolik: ustani tozalab asosiy menyuga qaytish"""
+    logger.error(f"Mavzu ustasi xatolik: {error}")
+    logger.error(traceback.format_exc())
+    clear_topic_wizard(context)
+    await update.message.reply_text(
+        "Xatolik yuz berdi. Asosiy menyuga qaytdingiz.",
+        reply_markup=admin_menu_markup()
+    )
 
-        if step_idx >= len(TOPIC_STEPS):
+async def save_topic_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        if not is_admin(update.message.from_user.id):
             return
 
-        step = TOPIC_STEPS[step_idx]
+        if context.user_data.get('topic_step', 0) == len(TOPIC_STEPS) and update.message.text == SAVE_BTN:
+            topic = context.user_data.get('topic')
+            if not topic or 'title' not in topic or 'structure' not in topic or 'examples' not in topic:
+                await update.message.reply_text("Ma'lumotlar to'liq emas.")
+                return
 
-        # Skip tugmasi bosilganda
-        if text == SKIP_BTN:
-            if step == 'image':
-                context.user_data['topic']['image_url'] = None
-                logger.info("Rasm o'tkazib yuborildi")
-            elif step == 'video':
-                context.user_data['topic']['video_url'] = None
-                logger.info("Video o'tkazib yuborildi")
-            
-            # Keyingi bosqichga o'tish
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-            return
+            payload = {k: v for k, v in topic.items() if not k.endswith('_file_id')}
+            ingestor = get_ingestor()
+            media = [(field, topic[f"{field}_file_id"]) for field in ('image', 'video') if topic.get(f"{field}_file_id")]
+            if any(ingestor.pending(file_id) for _, file_id in media):
+                await update.message.reply_text("⏳ Fayllar yuklanmoqda, biroz kuting...")
+            try:
+                for field, file_id in media:
+                    payload[f"{field}_url"] = await ingestor.result(file_id)
+            except Exception as e:
+                logger.error(f"Media ko'chirish xatolik: {e}")
+                await update.message.reply_text(
+                    "Faylni yuklashda xatolik yuz berdi. Qaytadan saqlab ko'ring yoki bekor qiling.",
+                    reply_markup=ReplyKeyboardMarkup([[KeyboardButton(SAVE_BTN)], [KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
+                )
+                return
 
-        # Matn kiritilganda
-        if step in ['title', 'structure', 'examples']:
-            if not validate_text(text):
+            try:
+                await get_api().create_topic(payload)
+            except ApiError as e:
+                logger.error(f"Topic saqlash xatolik: {e} {e.body}")
                 await update.message.reply_text(
-                    "Matn noto'g'ri formatda. Iltimos, qaytadan kiriting:",
+                    "Mavzuni saqlashda xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.",
                     reply_markup=ReplyKeyboardMarkup([[KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
                 )
                 return
 
-            context.user_data['topic'][step] = text
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-            return
+            if NOTIFY_NEW_TOPICS:
+                try:
+                    await get_broadcaster().start(
+                        f"🆕 Yangi mavzu: {topic['title']}\n\nKo'rish uchun Web App tugmasini bosing.",
+                        admin_chat_id=update.effective_chat.id,
+                        web_app_url=WEBAPP_URL
+                    )
+                except Exception as e:
+                    logger.error(f"Broadcast boshlash xatolik: {e}")
 
-        # Video havolasi kiritilganda
-        if step == 'video' and text:
-            if validate_youtube_url(text) or validate_url(text):
-                context.user_data['topic']['video_url'] = text
-                context.user_data['topic_step'] += 1
-                await ask_next_topic_step(update, context)
-            else:
-                keyboard = [
-                    [KeyboardButton(SKIP_BTN)],
-                    [KeyboardButton(CANCEL_BTN)]
-                ]
-                await update.message.reply_text(
-                    "Noto'g'ri video havolasi. Iltimos, to'g'ri havola kiriting yoki o'tkazib yuborish tugmasini bosing:",
-                    reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                )
-            return
+            # Barcha ma'lumotlarni tozalash
+            clear_topic_wizard(context)
 
+            # Asosiy menyuga qaytish
+            await update.message.reply_text(
+                "Mavzu saqlandi! Asosiy menyuga qaytdingiz.",
+                reply_markup=admin_menu_markup()
+            )
     except Exception as e:
-        logger.error(f"topic_text_step xatolik: {e}")
         # Xatolik yuz berganda asosiy menyuga qaytish
-        keyboard = [
-            [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-            [KeyboardButton("📊 Statistika")],
-            [KeyboardButton(NEW_TOPIC_BTN)],
-            [KeyboardButton(DELETE_TOPIC_BTN)]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-        await update.message.reply_text(
-            "Xatolik yuz berdi. Asosiy menyuga qaytdingiz.",
-            reply_markup=reply_markup
-        )
-        context.user_data.pop('topic', None)
-        context.user_data.pop('topic_step', None)
+        await topic_wizard_error(update, context, e)
 
-async def photo_handler_topic(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/broadcast <matn> - barcha foydalanuvchilarga xabar yuborish"""
     if not is_admin(update.message.from_user.id):
         return
-    if context.user_data.get('topic_step', 0) == TOPIC_STEPS.index('image'):
-        photo = update.message.photo[-1]
-        if photo.file_size > MAX_IMAGE_SIZE:
-            await update.message.reply_text(f"Rasm hajmi {MAX_IMAGE_SIZE/1024/1024}MB dan oshmasligi kerak.")
-            return
-        file = await photo.get_file()
-        context.user_data['topic']['image_url'] = file.file_path
-        context.user_data['topic_step'] += 1
-        await ask_next_topic_step(update, context)
-
-async def skip_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.partition(' ')[2].strip()
+    if not validate_text(text, max_length=4096):
+        await update.message.reply_text("Foydalanish: /broadcast <xabar matni>")
+        return
     try:
-        if not is_admin(update.message.from_user.id):
-            return
-
-        if 'topic_step' not in context.user_data:
-            return
-
-        step_idx = context.user_data['topic_step']
-        if step_idx >= len(TOPIC_STEPS):
-            return
-
-        step = TOPIC_STEPS[step_idx]
-        if update.message.text and update.message.text.strip() == SKIP_BTN:
-            logger.info(f"Skip tugmasi bosildi: {step} bosqichida")
-            
-            if step == 'image':
-                context.user_data['topic']['image_url'] = None
-                logger.info("Rasm o'tkazib yuborildi")
-            elif step == 'video':
-                context.user_data['topic']['video_url'] = None
-                logger.info("Video o'tkazib yuborildi")
-            
-            # Keyingi bosqichga o'tish
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-            return
-
+        await get_broadcaster().start(text, admin_chat_id=update.effective_chat.id)
     except Exception as e:
-        logger.error(f"skip_handler xatolik: {e}")
-        # Xatolik yuz berganda asosiy menyuga qaytish
-        keyboard = [
-            [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-            [KeyboardButton("📊 Statistika")],
-            [KeyboardButton(NEW_TOPIC_BTN)],
-            [KeyboardButton(DELETE_TOPIC_BTN)]
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-        await update.message.reply_text(
-            "Xatolik yuz berdi. Asosiy menyuga qaytdingiz.",
-            reply_markup=reply_markup
-        )
-        context.user_data.pop('topic', None)
-        context.user_data.pop('topic_step', None)
+        logger.error(f"Broadcast boshlash xatolik: {e}")
+        await update.message.reply_text("Xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.")
 
-async def video_handler_topic(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """📊 Statistika tugmasi"""
     if not is_admin(update.message.from_user.id):
         return
-    if context.user_data.get('topic_step', 0) == TOPIC_STEPS.index('video'):
-        text = update.message.text
-        # 1. Video fayl
-        if update.message.video:
-            video = update.message.video
-            if video.file_size > MAX_VIDEO_SIZE:
-                await update.message.reply_text(f"Video hajmi {MAX_VIDEO_SIZE/1024/1024}MB dan oshmasligi kerak.")
-                return
-            file = await video.get_file()
-            context.user_data['topic']['video_url'] = file.file_path
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-        # 2. YouTube havolasi
-        elif text and validate_youtube_url(text):
-            context.user_data['topic']['video_url'] = text
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-        # 3. Boshqa video havolasi
-        elif text and validate_url(text):
-            context.user_data['topic']['video_url'] = text
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-        # 4. Skip yoki cancel
-        elif text == SKIP_BTN:
-            context.user_data['topic']['video_url'] = None
-            context.user_data['topic_step'] += 1
-            await ask_next_topic_step(update, context)
-        elif text == CANCEL_BTN:
-            context.user_data.pop('topic', None)
-            context.user_data.pop('topic_step', None)
-            # Show main admin menu after cancel
-            keyboard = [
-                [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-                [KeyboardButton("📊 Statistika")],
-                [KeyboardButton(NEW_TOPIC_BTN)],
-                [KeyboardButton(DELETE_TOPIC_BTN)]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-            await update.message.reply_text("Mavzu yaratish bekor qilindi.", reply_markup=reply_markup)
-        # 5. Noto'g'ri format
-        else:
-            await update.message.reply_text(
-                "Video yoki video havolasini yuboring yoki o'tkazib yuborish uchun tugmani bosing:",
-                reply_markup=ReplyKeyboardMarkup([[KeyboardButton(SKIP_BTN)], [KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
-            )
+    try:
+        stats = await get_api().stats()
+        await update.message.reply_text(f"📊 Statistika\n\nFoydalanuvchilar soni: {stats['users_count']}")
+    except Exception as e:
+        logger.error(f"Statistika xatolik: {e}")
+        await update.message.reply_text("Statistikani olishda xatolik yuz berdi.")
 
-async def save_topic_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def delete_topic_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """O'chirish uchun oxirgi mavzular ro'yxati"""
+    if not is_admin(update.message.from_user.id):
+        return
     try:
-        if not is_admin(update.message.from_user.id):
+        topics = await get_api().list_topics(fields='id,title', limit=50)
+        if not topics:
+            await update.message.reply_text("Mavzular yo'q.")
             return
-
-        if context.user_data.get('topic_step', 0) == len(TOPIC_STEPS) and update.message.text == SAVE_BTN:
-            topic = context.user_data.get('topic')
-            if not topic or 'title' not in topic or 'structure' not in topic or 'examples' not in topic:
-                await update.message.reply_text("Ma'lumotlar to'liq emas.")
-                return
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{API_URL}/api/topics", json=topic) as resp:
-                    if resp.status == 200:
-                        # Barcha ma'lumotlarni tozalash
-                        context.user_data.pop('topic', None)
-                        context.user_data.pop('topic_step', None)
-
-                        # Asosiy menyuga qaytish
-                        keyboard = [
-                            [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-                            [KeyboardButton("📊 Statistika")],
-                            [KeyboardButton(NEW_TOPIC_BTN)],
-                            [KeyboardButton(DELETE_TOPIC_BTN)]
-                        ]
-                        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
-                        await update.message.reply_text(
-                            "Mavzu saqlandi! Asosiy menyuga qaytdingiz.",
-                            reply_markup=reply_markup
-                        )
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"Topic saqlash xatolik: {error_text}")
-                        await update.message.reply_text(
-                            "Mavzuni saqlashda xatolik yuz berdi. Iltimos, qaytadan urinib ko'ring.",
-                            reply_markup=ReplyKeyboardMarkup([[KeyboardButton(CANCEL_BTN)]], resize_keyboard=True)
-                        )
-    except Exception as e:
-        logger.error(f"save_topic_handler xatolik: {e}")
-        logger.error(traceback.format_exc())
-        # Xatolik yuz berganda asosiy menyuga qaytish
         keyboard = [
-            [KeyboardButton("🌐 Webapp", web_app=WebAppInfo(url=WEBAPP_URL))],
-            [KeyboardButton("📊 Statistika")],
-            [KeyboardButton(NEW_TOPIC_BTN)],
-            [KeyboardButton(DELETE_TOPIC_BTN)]
+            [InlineKeyboardButton(f"🗑 {topic['title']}", callback_data=f"delete_topic_{topic['id']}")]
+            for topic in topics
         ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
         await update.message.reply_text(
-            "Xatolik yuz berdi. Asosiy menyuga qaytdingiz.",
-            reply_markup=reply_markup
+            "O'chirish uchun mavzuni tanlang:",
+            reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        context.user_data.pop('topic', None)
-        context.user_data.pop('topic_step', None)
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"Mavzular ro'yxati xatolik: {e}")
+        await update.message.reply_text("Mavzular ro'yxatini olishda xatolik yuz berdi.")
+
+async def delete_topic_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    if not is_admin(query.from_user.id):
+        return
+    topic_id = int(query.data.rsplit('_', 1)[1])
+    try:
+        await get_api().delete_topic(topic_id)
+        await query.edit_message_text("Mavzu o'chirildi.")
+    except ApiError as e:
+        logger.error(f"Mavzuni o'chirish xatolik: {e} {e.body}")
+        await query.edit_message_text("Mavzuni o'chirishda xatolik yuz berdi.")
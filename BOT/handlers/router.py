@@ -0,0 +1,103 @@
+"""Xabarlarni handlerlarga yo'naltirish.
+
+Har bir xabar uchun ketma-ket regexlar tekshirilmaydi: tugma matnlari
+lug'atdan topiladi, mavzu yaratish ustasi esa aniq holatlar mashinasi -
+joriy holat (TOPIC_STEPS bosqichi yoki 'confirm') va xabar turi bo'yicha
+handler ham lug'atdan olinadi. Barcha tanlovlar O(1).
+
+Tartib: kontakt -> admin menyusi tugmalari -> usta tugmalari -> usta kiritishi.
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Message, Update
+from telegram.ext import ContextTypes
+
+import metrics
+from handlers import admin
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+# Xabar turlari
+TEXT = 'text'
+PHOTO = 'photo'
+VIDEO = 'video'
+CONTACT = 'contact'
+
+ADMIN_BUTTONS: Dict[str, Callback] = {
+    admin.STATS_BTN: admin.stats_handler,
+    admin.NEW_TOPIC_BTN: admin.new_topic_button,
+    admin.DELETE_TOPIC_BTN: admin.delete_topic_button,
+}
+
+# Holat -> {tugma matni: handler}
+WIZARD_BUTTONS: Dict[str, Dict[str, Callback]] = {
+    state: {admin.CANCEL_BTN: admin.topic_cancel}
+    for state in admin.TOPIC_STEPS + [admin.CONFIRM_STATE]
+}
+for _state in admin.SKIPPABLE_FIELDS:
+    WIZARD_BUTTONS[_state][admin.SKIP_BTN] = admin.topic_skip
+WIZARD_BUTTONS[admin.CONFIRM_STATE][admin.SAVE_BTN] = admin.save_topic_handler
+
+# Holat -> {xabar turi: handler}; jadvalda yo'q kiritish e'tiborsiz qoldiriladi
+WIZARD_INPUTS: Dict[str, Dict[str, Callback]] = {
+    'title': {TEXT: admin.topic_text_input},
+    'structure': {TEXT: admin.topic_text_input},
+    'examples': {TEXT: admin.topic_text_input},
+    'image': {PHOTO: admin.topic_photo_input},
+    'video': {VIDEO: admin.topic_video_input, TEXT: admin.topic_video_link},
+    admin.CONFIRM_STATE: {},
+}
+
+
+def message_kind(message: Message) -> Optional[str]:
+    if message.text is not None:
+        return TEXT
+    if message.photo:
+        return PHOTO
+    if message.video:
+        return VIDEO
+    if message.contact:
+        return CONTACT
+    return None
+
+
+def resolve(update: Update, user_data: Dict[str, Any]) -> Optional[Callback]:
+    """Xabar uchun handlerni tanlash (bajarmasdan)"""
+    message = update.message
+    if message is None or message.from_user is None:
+        return None
+    kind = message_kind(message)
+    if kind == CONTACT:
+        return admin.contact_handler
+    if not admin.is_admin(message.from_user.id):
+        return None
+    if kind == TEXT:
+        handler = ADMIN_BUTTONS.get(message.text)
+        if handler is not None:
+            return handler
+    state = admin.topic_state(user_data)
+    if state is None:
+        return None
+    if kind == TEXT:
+        handler = WIZARD_BUTTONS[state].get(message.text)
+        if handler is not None:
+            return handler
+    return WIZARD_INPUTS[state].get(kind)
+
+
+async def dispatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Barcha buyruq bo'lmagan xabarlar uchun yagona MessageHandler callbacki"""
+    handler = resolve(update, context.user_data)
+    if handler is None:
+        return
+    in_wizard = admin.topic_state(context.user_data) is not None
+    try:
+        with metrics.HANDLER_LATENCY.labels(handler.__name__).time():
+            await handler(update, context)
+    except Exception as e:
+        if not in_wizard:
+            raise
+        await admin.topic_wizard_error(update, context, e)
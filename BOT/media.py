@@ -0,0 +1,141 @@
+"""Telegram rasm/videolarini web ilova omboriga ko'chirish.
+
+Mavzu ustasida yuborilgan fayl Telegramdan bo'laklab yuklab olinadi va
+shu bo'laklar /api/uploads (bo'lakli yuklash) ga uzatiladi - fayl hech
+qachon to'liq xotirada bo'lmaydi. Natijada mavzuga bot tokeni bor, muddati
+o'tadigan Telegram havolasi emas, /static/uploads/<sha256>.<ext> yoziladi.
+
+Ko'chirish fonda bajariladi, usta esa keyingi bosqichga o'tadi; natija
+"Saqlash" bosilganda kutiladi. user_data da faqat file_id saqlanadi, shuning
+uchun bot qayta ishga tushsa ko'chirish file_id bo'yicha qaytadan boshlanadi.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv('MEDIA_INGEST_CONCURRENCY', 2))
+# Web API ga bitta PUT bilan yuboriladigan bo'lak (server chegarasi 8MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_READ_SIZE = 64 * 1024
+# Bot API getFile orqali yuklab olinadigan fayl chegarasi
+BOT_API_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+# Tugagan natija shuncha vaqt xotirada saqlanadi (Saqlash bosilishini kutib)
+RESULT_TTL = 3600
+
+
+class MediaError(Exception):
+    pass
+
+
+class MediaIngestor:
+    def __init__(self, bot, api, concurrency: int = CONCURRENCY):
+        self.bot = bot
+        self.api = api
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        # Alohida sessiya: web API sessiyasidagi X-API-Key Telegramga yuborilmasligi kerak
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=60))
+
+    async def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def submit(self, file_id: str):
+        """Ko'chirishni fonda boshlash (allaqachon boshlangan bo'lsa hech narsa qilmaydi)"""
+        task = self._tasks.get(file_id)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.create_task(self._ingest(file_id))
+            self._tasks[file_id] = task
+            task.add_done_callback(
+                lambda _: asyncio.get_running_loop().call_later(RESULT_TTL, self._forget, file_id, task)
+            )
+        return task
+
+    def _forget(self, file_id: str, task: asyncio.Task):
+        if self._tasks.get(file_id) is task:
+            del self._tasks[file_id]
+
+    def pending(self, file_id: str) -> bool:
+        task = self._tasks.get(file_id)
+        return task is None or not task.done()
+
+    async def result(self, file_id: str) -> str:
+        """Mahalliy URL ni qaytarish; kerak bo'lsa ko'chirishni boshlab kutish"""
+        return await asyncio.shield(self.submit(file_id))
+
+    async def _ingest(self, file_id: str) -> str:
+        async with self._semaphore:
+            file = await self.bot.get_file(file_id)
+            if not file.file_size:
+                raise MediaError('Fayl hajmi noma\'lum')
+            ext = os.path.splitext(file.file_path or '')[1].lstrip('.').lower() or 'jpg'
+            session = await self.api.upload_init(f"telegram.{ext}", file.file_size)
+            upload_id = session['upload_id']
+            try:
+                sha256 = await self._transfer(file.file_path, upload_id, file.file_size)
+                result = await self.api.upload_complete(upload_id, sha256)
+            except BaseException:
+                try:
+                    await asyncio.shield(self.api.upload_abort(upload_id))
+                except Exception:
+                    pass  # tugallanmagan sessiyani server o'zi tozalaydi
+                raise
+            # file_path da bot tokeni bor - logga faqat file_id yoziladi
+            logger.info(f"Media ko'chirildi: {file_id} -> {result['url']}")
+            return result['url']
+
+    async def _transfer(self, url: str, upload_id: str, size: int) -> str:
+        digest = hashlib.sha256()
+        buffer = bytearray()
+        offset = 0
+        async with self._session.get(url) as resp:
+            if resp.status != 200:
+                raise MediaError(f"Telegramdan yuklab bo'lmadi: {resp.status}")
+            async for chunk in resp.content.iter_chunked(DOWNLOAD_READ_SIZE):
+                digest.update(chunk)
+                buffer += chunk
+                if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    offset = await self.api.upload_chunk(upload_id, offset, bytes(buffer))
+                    buffer.clear()
+        if buffer:
+            offset = await self.api.upload_chunk(upload_id, offset, bytes(buffer))
+        if offset != size:
+            raise MediaError(f"Fayl to'liq yuklanmadi: {offset}/{size}")
+        return digest.hexdigest()
+
+
+_ingestor: Optional[MediaIngestor] = None
+
+
+def get_ingestor() -> MediaIngestor:
+    if _ingestor is None:
+        raise RuntimeError('MediaIngestor ishga tushirilmagan (post_init)')
+    return _ingestor
+
+
+async def start_ingestor(bot, api) -> MediaIngestor:
+    global _ingestor
+    _ingestor = MediaIngestor(bot, api)
+    await _ingestor.start()
+    return _ingestor
+
+
+async def stop_ingestor():
+    global _ingestor
+    if _ingestor is not None:
+        await _ingestor.close()
+        _ingestor = None
@@ -0,0 +1,73 @@
+"""Bot jarayoni uchun Prometheus metrikalari.
+
+BOT_METRICS_ADDR:BOT_METRICS_PORT (standart 127.0.0.1:9101, port 0 - o'chirilgan)
+da alohida oqimdagi HTTP server /metrics ni beradi. Autentifikatsiya yo'q,
+shuning uchun standart manzil faqat lokal - supervisor kabi:
+
+- handler bo'yicha yangilanishni qayta ishlash kechikishi;
+- PTB update_queue va SendScheduler navbati chuqurligi (scrape paytida o'qiladi);
+- web API (API_URL) so'rovlari kechikishi va natijasi.
+"""
+import logging
+import os
+import re
+import time
+from functools import wraps
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+METRICS_ADDR = os.getenv('BOT_METRICS_ADDR', '127.0.0.1')
+METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', 9101))
+
+HANDLER_LATENCY = Histogram(
+    'bot_handler_duration_seconds', 'Yangilanishni qayta ishlash kechikishi', ['handler'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPDATE_QUEUE = Gauge('bot_update_queue_depth', 'Qayta ishlanmagan yangilanishlar')
+SEND_QUEUE = Gauge('bot_send_queue_depth', 'SendScheduler da navbat kutayotgan so\'rovlar')
+API_LATENCY = Histogram(
+    'bot_api_request_duration_seconds', 'Web API so\'rovi kechikishi (har bir urinish)', ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 15),
+)
+API_RESPONSES = Counter('bot_api_responses_total', 'Web API javoblari', ['method', 'endpoint', 'status'])
+
+# /api/topics/42, /api/uploads/<hex> -> bitta yorliq
+_ID_SEGMENT = re.compile(r'/(\d+|[0-9a-f]{16,})(?=/|$)')
+
+
+def endpoint(path: str) -> str:
+    return _ID_SEGMENT.sub('/:id', path)
+
+
+def timed(handler):
+    """Handler callbackining kechikishini o'lchash (CommandHandler va h.k. uchun)"""
+    histogram = HANDLER_LATENCY.labels(handler.__name__)
+
+    @wraps(handler)
+    async def wrapper(update, context):
+        with histogram.time():
+            return await handler(update, context)
+    return wrapper
+
+
+def observe_api(method: str, path: str, status, started: float):
+    name = endpoint(path)
+    API_LATENCY.labels(method, name).observe(time.perf_counter() - started)
+    API_RESPONSES.labels(method, name, str(status)).inc()
+
+
+def start_metrics(application, port: int = METRICS_PORT, addr: str = METRICS_ADDR):
+    """Application post_init dan: scrape serverini ochish"""
+    if not port:
+        return
+    UPDATE_QUEUE.set_function(application.update_queue.qsize)
+    scheduler = application.bot.rate_limiter
+    if scheduler is not None and hasattr(scheduler, 'stats'):
+        SEND_QUEUE.set_function(lambda: scheduler.stats()['queue_depth'])
+    try:
+        start_http_server(port, addr=addr)
+        logger.info(f"Metrikalar {addr}:{port}/metrics da")
+    except OSError as e:
+        logger.error(f"Metrikalar serverini ochib bo'lmadi ({addr}:{port}): {e}")
@@ -0,0 +1,318 @@
+"""user_data/chat_data uchun doimiy va xotirasi cheklangan saqlash.
+
+PTB BasePersistence kengaytma nuqtasi orqali ulanadi. Mavzu ustasining
+holati (user_data['topic'], ['topic_step']) bot qayta ishga tushganda
+tiklanadi. Ikki xil ombor:
+
+- file (standart): BOT/data/state.db (sqlite), har bir foydalanuvchi alohida qator;
+- redis: STATE_REDIS_URL, har bir yozuv o'z TTL i bilan alohida kalit.
+
+Yozuvlar darhol emas, PTB ning update_interval davrida yig'ilib, bitta
+partiya sifatida fonda yoziladi. Yozish muvaffaqiyatsiz bo'lsa partiya
+navbatga qaytariladi (yangiroq yozuvlar ustidan yozilmaydi) va ortib boruvchi
+kutish bilan qayta uriniladi. Bo'sh lug'atlar saqlanmaydi. STATE_TTL
+davomida faol bo'lmagan yozuvlar ham ombordan, ham Application xotirasidan
+o'chiriladi, shuning uchun xotira foydalanuvchilar soni bilan o'smaydi.
+Qiymatlar JSON ko'rinishida saqlanadi.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STATE_DB = os.getenv('STATE_DB', os.path.join(DATA_DIR, 'state.db'))
+STATE_TTL = int(os.getenv('STATE_TTL', 24 * 3600))
+FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 5))
+EVICT_INTERVAL = 300
+# Yozish xatoligidan keyin qayta urinish: 1s, 2s, 4s ... WRITE_RETRY_MAX gacha
+WRITE_RETRY_MAX = 60
+# To'xtashda (flush) yozishga urinishlar soni
+FLUSH_ATTEMPTS = 3
+
+USER = 'user'
+CHAT = 'chat'
+
+# id -> (JSON yoki None - o'chirish, yozilgan vaqt)
+Batch = Dict[int, Tuple[Optional[str], float]]
+
+
+class FileStateStore:
+    """sqlite ombor; bloklovchi chaqiruvlar alohida oqimda bajariladi"""
+
+    def __init__(self, path: str = STATE_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS state (
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (kind, id)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    def _load(self, kind, since):
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT id, data, updated FROM state WHERE kind = ? AND updated >= ?', (kind, since)
+            ).fetchall()
+        return {row[0]: (json.loads(row[1]), row[2]) for row in rows}
+
+    def _write(self, kind, batch: Batch):
+        upserts = [(kind, i, data, ts) for i, (data, ts) in batch.items() if data is not None]
+        deletes = [(kind, i) for i, (data, _) in batch.items() if data is None]
+        with self.lock:
+            self.conn.executemany('INSERT OR REPLACE INTO state (kind, id, data, updated) VALUES (?, ?, ?, ?)', upserts)
+            self.conn.executemany('DELETE FROM state WHERE kind = ? AND id = ?', deletes)
+            self.conn.commit()
+
+    def _prune(self, before):
+        with self.lock:
+            self.conn.execute('DELETE FROM state WHERE updated < ?', (before,))
+            self.conn.commit()
+
+    async def load(self, kind: str, since: float) -> Dict[int, Tuple[Dict[str, Any], float]]:
+        return await asyncio.to_thread(self._load, kind, since)
+
+    async def write(self, kind: str, batch: Batch):
+        await asyncio.to_thread(self._write, kind, batch)
+
+    async def prune(self, before: float):
+        await asyncio.to_thread(self._prune, before)
+
+    async def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisStateStore:
+    """Redis ombor; muddati o'tgan yozuvlarni Redis o'zi o'chiradi"""
+
+    def __init__(self, url: str, ttl: int = STATE_TTL, prefix: str = 'eduverse:bot'):
+        import redis.asyncio as redis  # faqat shu ombor tanlanganda kerak
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, kind, i):
+        return f"{self.prefix}:{kind}:{i}"
+
+    async def load(self, kind: str, since: float) -> Dict[int, Tuple[Dict[str, Any], float]]:
+        result = {}
+        keys = [key async for key in self.redis.scan_iter(match=f"{self.prefix}:{kind}:*", count=1000)]
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start:start + 1000]
+            for key, raw in zip(chunk, await self.redis.mget(chunk)):
+                if raw is None:
+                    continue
+                entry = json.loads(raw)
+                result[int(key.rsplit(b':', 1)[1])] = (entry['data'], entry['updated'])
+        return result
+
+    async def write(self, kind: str, batch: Batch):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for i, (data, ts) in batch.items():
+                if data is None:
+                    pipe.delete(self._key(kind, i))
+                else:
+                    pipe.set(self._key(kind, i), f'{{"data": {data}, "updated": {ts}}}', ex=self.ttl)
+            await pipe.execute()
+
+    async def prune(self, before: float):
+        pass
+
+    async def close(self):
+        await self.redis.close()
+
+
+class StatePersistence(BasePersistence[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    def __init__(self, store, ttl: int = STATE_TTL, update_interval: float = FLUSH_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.ttl = ttl
+        # Oxirgi faollik vaqti - TTL bo'yicha chiqarish uchun
+        self._seen: Dict[str, Dict[int, float]] = {USER: {}, CHAT: {}}
+        self._stored: Dict[str, set] = {USER: set(), CHAT: set()}
+        self._pending: Dict[str, Batch] = {USER: {}, CHAT: {}}
+        self._writer: Optional[asyncio.Task] = None
+
+    # --- Yig'ish va fonda yozish ---
+    def _mark(self, kind: str, i: int, data: Optional[Dict[str, Any]]):
+        now = time.time()
+        if data is None:
+            self._seen[kind].pop(i, None)
+        else:
+            self._seen[kind][i] = now
+        if not data:
+            if i not in self._stored[kind]:
+                return
+            payload = None
+        else:
+            try:
+                payload = json.dumps(data, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"{kind} {i} holatini saqlab bo'lmadi: {e}")
+                return
+        self._pending[kind][i] = (payload, now)
+        if self._writer is None or self._writer.done():
+            # update_persistence barcha update_* larni yig'ib bo'lgach bitta partiya yoziladi
+            self._writer = asyncio.get_running_loop().create_task(self._write_pending())
+
+    def _requeue(self, kind: str, batch: Batch):
+        # Yozilmagan partiya navbatga qaytadi; shu orada kelgan yangiroq qiymat saqlanib qoladi
+        pending = self._pending[kind]
+        for i, entry in batch.items():
+            pending.setdefault(i, entry)
+
+    async def _write_pending(self, attempts: Optional[int] = None) -> bool:
+        """Navbatni yozish; attempts=None - yozilguncha qayta urinish. Hammasi yozildimi"""
+        delay = 1.0
+        failures = 0
+        while any(self._pending.values()):
+            failed = False
+            for kind in (USER, CHAT):
+                batch, self._pending[kind] = self._pending[kind], {}
+                if not batch:
+                    continue
+                try:
+                    await self.store.write(kind, batch)
+                except asyncio.CancelledError:
+                    self._requeue(kind, batch)
+                    raise
+                except Exception as e:
+                    logger.error(f"Holatni yozishda xatolik ({kind}, {len(batch)} ta): {e}")
+                    self._requeue(kind, batch)
+                    failed = True
+                    continue
+                for i, (payload, _) in batch.items():
+                    if payload is None:
+                        self._stored[kind].discard(i)
+                    else:
+                        self._stored[kind].add(i)
+            if not failed:
+                delay = 1.0
+                continue
+            failures += 1
+            if attempts is not None and failures >= attempts:
+                return False
+            logger.info(f"Holatni yozish {delay:.0f}s dan keyin qayta uriniladi")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WRITE_RETRY_MAX)
+        return True
+
+    async def _load(self, kind: str) -> Dict[int, Dict[str, Any]]:
+        rows = await self.store.load(kind, time.time() - self.ttl)
+        self._seen[kind] = {i: ts for i, (_, ts) in rows.items()}
+        self._stored[kind] = set(rows)
+        logger.info(f"{kind}_data tiklandi: {len(rows)} ta")
+        return {i: data for i, (data, _) in rows.items()}
+
+    # --- TTL bo'yicha chiqarish ---
+    def expired(self, kind: str, now: Optional[float] = None):
+        cutoff = (now or time.time()) - self.ttl
+        return [i for i, ts in self._seen[kind].items() if ts < cutoff]
+
+    async def run_eviction(self, application, interval: float = EVICT_INTERVAL):
+        """Faol bo'lmagan user_data/chat_data ni Application xotirasidan chiqarish"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                users, chats = self.expired(USER), self.expired(CHAT)
+                for user_id in users:
+                    application.drop_user_data(user_id)
+                    self._seen[USER].pop(user_id, None)
+                for chat_id in chats:
+                    application.drop_chat_data(chat_id)
+                    self._seen[CHAT].pop(chat_id, None)
+                await self.store.prune(time.time() - self.ttl)
+                if users or chats:
+                    logger.info(f"Holat chiqarildi: {len(users)} user, {len(chats)} chat")
+            except Exception as e:
+                logger.error(f"Holatni chiqarishda xatolik: {e}")
+
+    # --- BasePersistence ---
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        return await self._load(USER)
+
+    async def get_chat_data(self) -> Dict[int, Dict[str, Any]]:
+        return await self._load(CHAT)
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]) -> None:
+        self._mark(USER, user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[str, Any]) -> None:
+        self._mark(CHAT, chat_id, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._mark(USER, user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._mark(CHAT, chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[str, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[str, Any]) -> None:
+        pass
+
+    async def get_bot_data(self) -> Dict[str, Any]:
+        return {}
+
+    async def update_bot_data(self, data: Dict[str, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[str, Any]) -> None:
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """To'xtashda: qolgan partiyani yozib omborni yopish"""
+        if self._writer is not None and not self._writer.done():
+            # Fondagi yozuvchi qayta urinish kutishida bo'lishi mumkin - navbat shu yerda yoziladi
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        try:
+            if not await self._write_pending(attempts=FLUSH_ATTEMPTS):
+                logger.error(
+                    f"Holat saqlanmadi: {len(self._pending[USER])} user, "
+                    f"{len(self._pending[CHAT])} chat yozuvi yo'qoladi"
+                )
+        finally:
+            await self.store.close()
+
+
+def create_persistence() -> StatePersistence:
+    backend = os.getenv('STATE_BACKEND', 'file')
+    if backend == 'redis':
+        store = RedisStateStore(os.getenv('STATE_REDIS_URL') or os.environ['REDIS_URL'])
+    else:
+        store = FileStateStore()
+    return StatePersistence(store)
@@ -0,0 +1,231 @@
+"""Telegram Bot API ga chiquvchi so'rovlar rejalashtiruvchisi.
+
+PTB ning BaseRateLimiter kengaytma nuqtasi orqali ulanadi, shuning uchun
+barcha reply_text/send_message/edit_message_text chaqiruvlari shu yerdan
+o'tadi. Telegram cheklovlari token bucketlar bilan qo'llanadi:
+
+- umumiy: ~30 xabar/soniya;
+- shaxsiy chat: ~1 xabar/soniya;
+- guruh/kanal: 20 xabar/daqiqa.
+
+Navbatdagi so'rovlar ustuvorlik bo'yicha beriladi (admin javoblari ommaviy
+yuborishdan oldin). RetryAfter kelganda butun rejalashtiruvchi Telegram
+ko'rsatgan vaqtga to'xtatiladi va so'rov qayta yuboriladi.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Ustuvorlik navbatlari: kichik son - oldinroq
+PRIORITY_ADMIN = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2
+
+GLOBAL_RATE = 30
+PRIVATE_RATE = 1
+GROUP_RATE = 20 / 60
+GROUP_BURST = 3
+# Chat bucketlari shu vaqt ishlatilmasa xotiradan chiqariladi
+BUCKET_IDLE_SECONDS = 60
+# Cheklanmaydigan endpointlar (xabar yubormaydi)
+UNLIMITED_ENDPOINTS = {'getUpdates', 'getMe', 'getFile', 'setWebhook', 'deleteWebhook', 'getWebhookInfo'}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Bitta token bo'lguncha kutish vaqti (0 - hozir mumkin)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'chat_id', 'future', 'enqueued')
+
+    def __init__(self, priority, seq, chat_id, future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class SendScheduler(BaseRateLimiter[Dict[str, Any]]):
+    def __init__(self, admin_ids: Iterable[int] = (), max_retries: int = 3,
+                 global_rate: float = GLOBAL_RATE, private_rate: float = PRIVATE_RATE,
+                 group_rate: float = GROUP_RATE):
+        self.admin_ids = set(admin_ids)
+        self.max_retries = max_retries
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._last_sweep = time.monotonic()
+        # Hisoblagichlar
+        self.sent = 0
+        self.retry_after_count = 0
+        self.total_wait = 0.0
+        self.max_queue_depth = 0
+
+    async def initialize(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for waiter in self._waiting:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self._waiting.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': len(self._waiting),
+            'max_queue_depth': self.max_queue_depth,
+            'sent': self.sent,
+            'retry_after': self.retry_after_count,
+            'avg_wait': self.total_wait / self.sent if self.sent else 0.0,
+            'paused_for': max(0.0, self._paused_until - time.monotonic()),
+        }
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, GROUP_BURST) if is_group else TokenBucket(self.private_rate, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _sweep(self, now: float):
+        """Bo'sh (to'lgan) chat bucketlarini o'chirish - ommaviy yuborishdan keyin xotira qaytadi"""
+        if now - self._last_sweep < BUCKET_IDLE_SECONDS:
+            return
+        self._last_sweep = now
+        waiting = {w.chat_id for w in self._waiting}
+        for chat_id in [c for c, b in self._chats.items() if c not in waiting and b.idle(now)]:
+            del self._chats[chat_id]
+
+    async def _acquire(self, chat_id, priority: int):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(_Waiter(priority, next(self._seq), chat_id, future))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        self._wakeup.set()
+        await future
+
+    async def _dispatch(self):
+        while True:
+            try:
+                await self._dispatch_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Dispatcher to'xtasa barcha yuborishlar osilib qoladi
+                logger.error(f"SendScheduler xatolik: {e}")
+                await asyncio.sleep(0.1)
+
+    async def _dispatch_next(self):
+        """Bitta ruxsat berish yoki keyingi imkoniyatgacha kutish"""
+        self._waiting = [w for w in self._waiting if not w.future.done()]
+        if not self._waiting:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+            return
+        now = time.monotonic()
+        self._sweep(now)
+        wait = max(self._paused_until - now, self._global.delay(now))
+        ready = None
+        if wait <= 0:
+            # Tayyorlar ichidan eng yuqori ustuvorlikdagisi; navbat yuboruvchilar
+            # soni bilan cheklangan, shuning uchun chiziqli qidiruv yetarli
+            wait = float('inf')
+            for waiter in self._waiting:
+                delay = 0.0 if waiter.chat_id is None else self._chat_bucket(waiter.chat_id).delay(now)
+                if delay <= 0:
+                    if ready is None or (waiter.priority, waiter.seq) < (ready.priority, ready.seq):
+                        ready = waiter
+                else:
+                    wait = min(wait, delay)
+        if ready is None:
+            # Yangi so'rov kelsa (balki tayyor chatga) muddatidan oldin uyg'onamiz
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            return
+        self._global.take(now)
+        if ready.chat_id is not None:
+            self._chat_bucket(ready.chat_id).take(now)
+        self._waiting.remove(ready)
+        self.total_wait += now - ready.enqueued
+        ready.future.set_result(None)
+
+    def _priority(self, chat_id, rate_limit_args: Optional[Dict[str, Any]]) -> int:
+        if rate_limit_args and 'priority' in rate_limit_args:
+            return rate_limit_args['priority']
+        return PRIORITY_ADMIN if chat_id in self.admin_ids else PRIORITY_DEFAULT
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+        chat_id = data.get('chat_id')
+        priority = self._priority(chat_id, rate_limit_args)
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent += 1
+                return result
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.retry_after_count += 1
+                # Flood cheklovi butun bot uchun - barcha yuborishlar to'xtatiladi
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                logger.warning(f"RetryAfter {retry_after}s ({endpoint}, chat={chat_id}), urinish {attempt + 1}")
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
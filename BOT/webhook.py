@@ -0,0 +1,119 @@
+"""Botni webhook rejimida ishga tushirish (aiohttp server).
+
+Telegram yangilanishlarni POST qilib yuboradi, server har bir so'rovda
+X-Telegram-Bot-Api-Secret-Token sarlavhasini tekshiradi va yangilanishni
+Application navbatiga qo'yadi. Long polling kechikishi va bo'sh so'rovlar
+yo'qoladi, bir nechta bot nusxasi load balancer ortida ishlay oladi.
+
+allowed_updates ro'yxatdan o'tgan handlerlar turidan hisoblanadi - Telegram
+bot ishlatmaydigan yangilanishlarni yubormaydi.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import signal
+from json import JSONDecodeError
+from typing import List
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Handler turi -> u qayta ishlaydigan yangilanish turlari. Handlerlar
+# update.message bilan ishlaydi, shuning uchun tahrirlangan xabarlar so'ralmaydi.
+HANDLER_UPDATE_TYPES = {
+    CommandHandler: [Update.MESSAGE],
+    MessageHandler: [Update.MESSAGE],
+    CallbackQueryHandler: [Update.CALLBACK_QUERY],
+}
+
+
+def allowed_updates(application: Application) -> List[str]:
+    """Ro'yxatdan o'tgan handlerlar uchun kerakli yangilanish turlari"""
+    types = set()
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            for handler_type, update_types in HANDLER_UPDATE_TYPES.items():
+                if isinstance(handler, handler_type):
+                    types.update(update_types)
+                    break
+            else:
+                # Noma'lum handler - hech narsa yo'qolmasligi uchun hammasi
+                logger.warning(f"allowed_updates: noma'lum handler {type(handler).__name__}")
+                return Update.ALL_TYPES
+    return sorted(types)
+
+
+def default_secret(token: str) -> str:
+    """Barcha nusxalar uchun bir xil, tokendan olinadigan maxfiy kalit"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def make_app(application: Application, path: str, secret: str) -> web.Application:
+    async def handle_update(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except (JSONDecodeError, UnicodeDecodeError):
+            return web.Response(status=400)
+        update = Update.de_json(data, application.bot)
+        if update is None:
+            return web.Response(status=400)
+        # Telegram tez javob kutadi - qayta ishlash Application navbatida
+        await application.update_queue.put(update)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+def _stop_signals(stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: KeyboardInterrupt orqali to'xtatiladi
+            pass
+
+
+async def run_webhook(application: Application, *, url: str, listen: str, port: int, path: str,
+                      secret: str, max_connections: int = 40):
+    """run_polling o'rniga: Application hayot siklini qo'lda boshqarish"""
+    allowed = allowed_updates(application)
+    stop = asyncio.Event()
+    _stop_signals(stop)
+    runner = web.AppRunner(make_app(application, path, secret), access_log=None)
+    await application.initialize()
+    try:
+        # run_polling/run_webhook bilan bir xil tartib: initialize -> post_init -> start
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=url.rstrip('/') + path,
+            secret_token=secret,
+            allowed_updates=allowed,
+            max_connections=max_connections,
+        )
+        await application.start()
+        await runner.setup()
+        await web.TCPSite(runner, listen, port).start()
+        logger.info(f"Webhook {listen}:{port}{path} da tinglanmoqda, allowed_updates={allowed}")
+        await stop.wait()
+    finally:
+        # Webhook o'chirilmaydi: boshqa nusxalar xizmat qilishda davom etadi
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
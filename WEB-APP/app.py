@@ -1,22 +1,41 @@
-from flask import Flask, jsonify, render_template, request, send_from_directory
+import eventlet
+if __name__ == '__main__':
+    # gunicorn eventlet workeri buni o'zi qiladi; to'g'ridan-to'g'ri ishga tushirilganda
+    # Redis message queue tinglovchisi va DB drayverlari hub ni bloklamasligi uchun kerak
+    eventlet.monkey_patch()
+
+from flask import Flask, g, jsonify, render_template, request, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_caching import Cache
 from flask_socketio import SocketIO, emit
 import os
-from sqlalchemy import create_engine, text
-from sqlalchemy_utils import database_exists, create_database
+import errno
+import random
+import signal
+import time
+from sqlalchemy import text, event, inspect, or_, and_
+from sqlalchemy.orm import load_only
 from dotenv import load_dotenv
 import pymysql
 import logging
 from logging.handlers import RotatingFileHandler
-from werkzeug.utils import secure_filename
 import uuid
 from datetime import datetime
 import traceback
 import re
+import hashlib
+import base64
+from urllib.parse import urlencode
+from werkzeug.exceptions import HTTPException
 from functools import wraps
-import eventlet
+from migrations import upgrade as upgrade_schema
+from request_log import init_request_logging
+from metrics import init_metrics, SOCKET_CONNECTIONS, UPLOAD_BYTES
+from sql_profiler import init_sql_profiler
+from storage import UploadStorage, UploadError, file_extension, valid_sha256
+from images import ImageDerivatives
+from assets import init_assets
 
 # Load environment variables
 load_dotenv()
@@ -36,18 +55,33 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 }
 
 # Cache configuration
-cache = Cache(app, config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 300
-})
+# REDIS_URL berilsa barcha workerlar bitta umumiy keshdan foydalanadi,
+# aks holda har bir jarayonning o'z xotira keshi ishlatiladi
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    cache_config = {
+        'CACHE_TYPE': 'RedisCache',
+        'CACHE_REDIS_URL': REDIS_URL,
+        'CACHE_KEY_PREFIX': 'eduverse:',
+        'CACHE_DEFAULT_TIMEOUT': 300
+    }
+else:
+    cache_config = {
+        'CACHE_TYPE': 'SimpleCache',
+        'CACHE_DEFAULT_TIMEOUT': 300
+    }
+cache = Cache(app, config=cache_config)
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
 
 # CORS configuration
 CORS(app)
 
 # WebSocket configuration
+# REDIS_URL berilsa emit lar Redis pub/sub orqali barcha workerlardagi mijozlarga yetadi
 socketio = SocketIO(
     app,
     async_mode='eventlet',
+    message_queue=REDIS_URL,
     ping_timeout=60,
     ping_interval=25,
     cors_allowed_origins="*",
@@ -59,8 +93,21 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 UPLOAD_FOLDER = os.path.join(app.static_folder, 'uploads')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# app.js va style.css xeshlangan nomlar bilan /assets/ orqali beriladi
+init_assets(app)
+
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Fayllar kontent xeshi bo'yicha saqlanadi (dublikatlar qayta yozilmaydi).
+# Tugallanmagan yuklashlar statik papkadan tashqarida - ular URL orqali ochilmaydi
+storage = UploadStorage(
+    app.config['UPLOAD_FOLDER'], '/static/uploads', os.path.join(app.root_path, 'data', 'partial-uploads')
+)
+# Rasmlarning kichraytirilgan WebP/JPEG variantlari (/media/<xesh>-<kenglik>.<ext>)
+derivatives = ImageDerivatives(
+    app.config['UPLOAD_FOLDER'], '/static/uploads',
+    os.path.join(app.config['UPLOAD_FOLDER'], 'derived'), '/media'
+)
 
 # Logging configuration
 if not os.path.exists('logs'):
@@ -80,11 +127,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# --- Error logging middleware ---
-@app.before_request
-def log_request_info():
-    logger.info('Headers: %s', dict(request.headers))
-    logger.info('Body: %s', request.get_data())
+# --- Request logging middleware ---
+# Har so'rovga route/status/davomiylik qatori; sarlavha va JSON tana faqat
+# REQUEST_LOG_SAMPLE_RATE ulushida (fayl yuklashlar tanasi o'qilmaydi)
+init_request_logging(app, logger)
 
 class APIError(Exception):
     def __init__(self, message, status_code=500, details=None):
@@ -94,6 +140,7 @@ class APIError(Exception):
         self.details = details or {}
 
 @app.errorhandler(APIError)
+@app.errorhandler(UploadError)
 def handle_api_error(error):
     response = {
         'error': error.message,
@@ -122,14 +169,14 @@ for handler in logger.handlers:
 # Initialize database
 db = SQLAlchemy(app)
 
-# --- Baza avtomatik yaratiladi ---
-db_url = app.config['SQLALCHEMY_DATABASE_URI']
-engine = create_engine(db_url)
-if not database_exists(engine.url):
-    create_database(engine.url)
-    logger.info(f"Baza yaratildi: {engine.url}")
-else:
-    logger.info(f"Baza allaqachon mavjud: {engine.url}")
+# Prometheus: /metrics (METRICS_TOKEN bilan)
+init_metrics(app, db, socketio)
+# Sekin SQL logi, so'rov bo'yicha statementlar soni va N+1 (SQL_PROFILE_SAMPLE_RATE ulushida)
+init_sql_profiler(app, db, logger)
+
+# Baza, jadvallar va migratsiyalar import paytida emas, bir martalik
+# `flask --app app init-db` buyrug'ida yaratiladi (main.py o'zi chaqiradi).
+# Ulanishlar puli db.engine ga birinchi murojaatda ochiladi.
 
 # --- Modellar ---
 class Contact(db.Model):
@@ -139,6 +186,8 @@ class Contact(db.Model):
     last_name = db.Column(db.String(255))
     phone_number = db.Column(db.String(32))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Botni bloklagan foydalanuvchi: ommaviy xabarlar yuborilmaydi
+    blocked_at = db.Column(db.DateTime, nullable=True)
 
 class Topic(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -147,15 +196,23 @@ class Topic(db.Model):
     examples = db.Column(db.Text)
     image_url = db.Column(db.String(255))
     video_url = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Yozish paytida tayyorlangan HTML (format_sentences natijasi)
+    structure_html = db.Column(db.Text)
+    examples_html = db.Column(db.Text)
+    render_version = db.Column(db.Integer, default=0)
 
 class News(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255))
     content = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class Feedback(db.Model):
+    __table_args__ = (
+        db.Index('ix_feedback_created_at', 'created_at'),
+        db.Index('ix_feedback_topic_id_created_at', 'topic_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.BigInteger, nullable=True)
     user_name = db.Column(db.String(255), nullable=True)
@@ -163,15 +220,6 @@ class Feedback(db.Model):
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-def allowed_file(filename):
-    """Fayl kengaytmasini tekshirish"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'}
-
-def generate_filename(filename):
-    """Xavfsiz fayl nomi yaratish"""
-    ext = filename.rsplit('.', 1)[1].lower()
-    return f"{uuid.uuid4().hex}.{ext}"
-
 def format_sentences(text):
     if not text:
         return ""
@@ -192,6 +240,191 @@ def format_sentences(text):
         formatted.append(out)
     return '\n'.join(formatted)
 
+# format_sentences natijasi o'zgarsa versiyani oshiring - eski renderlar
+# o'qish paytida avtomatik qayta hisoblanadi
+RENDER_VERSION = 1
+
+def render_topic(topic):
+    """Mavzu matnlarini HTML ko'rinishga keltirib, modelga yozib qo'yish"""
+    topic.structure_html = format_sentences(topic.structure)
+    topic.examples_html = format_sentences(topic.examples)
+    topic.render_version = RENDER_VERSION
+
+@event.listens_for(Topic, 'before_insert')
+def _render_topic_on_insert(mapper, connection, target):
+    render_topic(target)
+
+@event.listens_for(Topic, 'before_update')
+def _render_topic_on_update(mapper, connection, target):
+    state = inspect(target)
+    changed = (
+        state.attrs.structure.history.has_changes()
+        or state.attrs.examples.history.has_changes()
+    )
+    if changed or target.render_version != RENDER_VERSION:
+        render_topic(target)
+
+def ensure_rendered(topics):
+    """Eskirgan (render_version mos kelmagan) mavzularni qayta render qilish"""
+    stale = [t for t in topics if t.render_version != RENDER_VERSION]
+    if not stale:
+        return
+    for t in stale:
+        render_topic(t)
+    try:
+        db.session.commit()
+        logger.info(f"{len(stale)} ta mavzu qayta render qilindi")
+    except Exception as e:
+        # Render natijasi baribir qaytariladi, keyingi so'rovda yana urinib ko'riladi
+        db.session.rollback()
+        logger.error(f"Mavzularni render qilishda xatolik: {e}")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Bazani (yo'q bo'lsa), jadvallarni yaratish va migratsiyalarni qo'llash"""
+    # sqlalchemy_utils faqat shu buyruqqa kerak - worker importini sekinlashtirmaydi
+    from sqlalchemy_utils import database_exists, create_database
+    if not database_exists(db.engine.url):
+        create_database(db.engine.url)
+        print(f"Baza yaratildi: {db.engine.url.render_as_string(hide_password=True)}")
+    db.create_all()
+    applied = upgrade_schema(db.engine)
+    print(f"Qo'llangan migratsiyalar: {applied}")
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Sxema migratsiyalarini jonli bazaga qo'llash"""
+    db.create_all()
+    applied = upgrade_schema(db.engine)
+    print(f"Qo'llangan migratsiyalar: {applied}")
+
+@app.cli.command('render-topics')
+def render_topics_command():
+    """Mavjud mavzularni bir martalik qayta render qilish (backfill)"""
+    upgrade_schema(db.engine)
+    batch_size = 200
+    total = 0
+    last_id = 0
+    while True:
+        batch = (
+            Topic.query
+            .filter(Topic.id > last_id)
+            .filter(or_(Topic.render_version.is_(None), Topic.render_version != RENDER_VERSION))
+            .order_by(Topic.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for t in batch:
+            render_topic(t)
+        db.session.commit()
+        total += len(batch)
+        last_id = batch[-1].id
+    print(f"Qayta render qilingan mavzular: {total}")
+
+# --- Sahifalash (keyset) va maydonlarni tanlash ---
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+def encode_cursor(created_at, row_id):
+    """(created_at, id) juftligini URL uchun xavfsiz kursorga aylantirish"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise APIError("Kursor noto'g'ri", 400)
+
+def parse_limit(default=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT):
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise APIError("limit butun son bo'lishi kerak", 400)
+    return max(1, min(limit, maximum))
+
+def keyset_page(query, model, cursor, limit, entity=lambda row: row):
+    """created_at, id bo'yicha kamayish tartibida bitta sahifa va keyingi kursorni qaytarish
+
+    entity - natija qatoridan model obyektini oladi (bir nechta ustunli so'rovlar uchun)
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = entity(rows[-1])
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+def set_next_cursor(response, next_cursor):
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+TOPIC_FIELDS = {
+    # maydon: (kerakli ustunlar, qiymatni olish)
+    'id': ((Topic.id,), lambda t: t.id),
+    'title': ((Topic.title,), lambda t: t.title),
+    'structure': ((Topic.structure_html, Topic.render_version), lambda t: t.structure_html),
+    'examples': ((Topic.examples_html, Topic.render_version), lambda t: t.examples_html),
+    'image_url': ((Topic.image_url,), lambda t: t.image_url),
+    'video_url': ((Topic.video_url,), lambda t: t.video_url),
+    'image_srcset': ((Topic.image_url,), lambda t: derivatives.srcset(t.image_url)),
+    'created_at': ((Topic.created_at,), lambda t: t.created_at.isoformat() if t.created_at else None),
+}
+DEFAULT_TOPIC_LIST_FIELDS = ('id', 'title', 'structure', 'examples')
+
+# --- Feedback: foydalanuvchi ismi va mavzu nomi bitta so'rovda ---
+DEFAULT_FEEDBACK_LIMIT = 5
+MAX_FEEDBACK_LIMIT = 50
+
+def feedback_query():
+    return (
+        db.session.query(Feedback, Contact.first_name, Topic.title)
+        .outerjoin(Contact, Contact.user_id == Feedback.user_id)
+        .outerjoin(Topic, Topic.id == Feedback.topic_id)
+    )
+
+def serialize_feedback(row):
+    f, first_name, topic_title = row
+    if f.user_id:
+        user_display = first_name or 'Foydalanuvchi'
+    else:
+        user_display = f.user_name or 'Foydalanuvchi'
+    return {
+        'id': f.id,
+        'user': user_display,
+        'topic': topic_title or 'Mavzu',
+        'comment': f.comment,
+        'created_at': f.created_at.strftime('%Y-%m-%d')
+    }
+
+def parse_fields(allowed, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise APIError(f"Noma'lum maydonlar: {', '.join(unknown)}", 400)
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
 # API key tekshiruv
 def require_api_key(f):
     @wraps(f)
@@ -202,12 +435,67 @@ def require_api_key(f):
         return f(*args, **kwargs)
     return decorated
 
+# --- API javoblarini keshlash (teglar bo'yicha bekor qilinadi) ---
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+def invalidate_cache(*tags):
+    """Teglarga bog'langan barcha keshlangan javoblarni eskirgan deb belgilash"""
+    try:
+        # Har safar yangi token - parallel yozuvlar ham bir-birining tokenini qaytarmaydi
+        cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=0)
+    except Exception as e:
+        logger.error(f"Keshni tozalashda xatolik: {e}")
+
+# Javob tanasi bilan birga saqlanadigan sarlavhalar (sahifalash)
+CACHED_HEADERS = ('X-Next-Cursor', 'Link')
+
+def _response_cache_key(tags):
+    versions = cache.get_many(*[_tag_key(tag) for tag in tags])
+    args = urlencode(sorted(request.args.items(multi=True)))
+    raw = '|'.join([request.path, args] + [str(v or 0) for v in versions])
+    return 'resp:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def cached_response(*tags, timeout=None):
+    """GET javobini baytlari bilan keshlash; POST/DELETE o'zgarishsiz o'tadi"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+            try:
+                key = _response_cache_key(tags)
+                body = cache.get(key)
+            except Exception as e:
+                logger.error(f"Kesh o'qishda xatolik: {e}")
+                return f(*args, **kwargs)
+            if body is not None:
+                body, headers = body
+                response = app.response_class(body, mimetype='application/json')
+                response.headers.extend(headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                headers = [(h, response.headers[h]) for h in CACHED_HEADERS if h in response.headers]
+                try:
+                    cache.set(key, (response.get_data(), headers), timeout=timeout or RESPONSE_CACHE_TIMEOUT)
+                except Exception as e:
+                    logger.error(f"Kesh yozishda xatolik: {e}")
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated
+    return decorator
+
 @app.after_request
 def add_header(response):
     """Add headers to optimize caching and performance."""
     if 'Cache-Control' not in response.headers:
         if request.path.startswith('/static/'):
             response.headers['Cache-Control'] = 'public, max-age=31536000'
+        elif response.mimetype == 'text/html':
+            # Sahifa har doim qayta tekshiriladi - yangi build ning asset URL lari darhol ko'rinadi
+            response.headers['Cache-Control'] = 'no-cache'
         else:
             response.headers['Cache-Control'] = 'public, max-age=300'
     response.headers['Vary'] = 'Accept-Encoding'
@@ -234,7 +522,7 @@ def handle_exception(e):
 @cache.cached(timeout=60)
 def health_check():
     try:
-        db.session.execute('SELECT 1')
+        db.session.execute(text('SELECT 1'))
         db.session.commit()
         return jsonify({
             'status': 'healthy',
@@ -248,6 +536,14 @@ def health_check():
             'error': str(e)
         }), 500
 
+# Supervisor uchun tayyorlik: kesh yo'q, pid bilan - rolling reload paytida bir xil
+# portdagi (SO_REUSEPORT) eski va yangi workerni ajratish uchun
+@app.route('/ready')
+def readiness_check():
+    response = jsonify({'status': 'draining' if draining else 'ready', 'pid': os.getpid()})
+    response.headers['Cache-Control'] = 'no-store'
+    return response, 503 if draining else 200
+
 # --- API: contact saqlash ---
 @app.route('/api/contacts', methods=['POST'])
 def save_contact():
@@ -279,6 +575,7 @@ def save_contact():
             logger.info("Baza ulanishi muvaffaqiyatli")
 
             contact = Contact.query.filter_by(user_id=user_id).first()
+            created = contact is None
             if not contact:
                 contact = Contact(
                     user_id=user_id,
@@ -292,9 +589,15 @@ def save_contact():
                 contact.first_name = first_name
                 contact.last_name = last_name
                 contact.phone_number = phone_number
+                # Kontakt qayta yuborilsa foydalanuvchi botni blokdan chiqargan
+                contact.blocked_at = None
                 logger.info(f"Contact yangilandi: {user_id}")
 
             db.session.commit()
+            if created:
+                increment_users_count()
+            # Feedback ro'yxatida foydalanuvchi ismi ko'rsatiladi
+            invalidate_cache('contacts')
             logger.info("Contact muvaffaqiyatli saqlandi")
             return jsonify({'status': 'ok'})
 
@@ -316,6 +619,7 @@ def save_contact():
 
 # --- API: barcha topics ---
 @app.route('/api/topics', methods=['GET', 'POST'])
+@cached_response('topics')
 def topics():
     try:
         if request.method == 'POST':
@@ -335,17 +639,28 @@ def topics():
             )
             db.session.add(topic)
             db.session.commit()
+            invalidate_cache('topics')
             logger.info(f"Yangi mavzu qo'shildi: {topic.title}")
             return jsonify({'status': 'ok'})
         else:
-            all_topics = Topic.query.order_by(Topic.created_at.desc()).all()
-            return jsonify([{
-                'id': t.id,
-                'title': t.title,
-                'structure': format_sentences(t.structure),
-                'examples': format_sentences(t.examples),
-            } for t in all_topics])
+            fields = parse_fields(TOPIC_FIELDS, DEFAULT_TOPIC_LIST_FIELDS)
+            limit = parse_limit()
+            # Keyset uchun created_at doim kerak; katta matn ustunlari faqat so'ralganda yuklanadi
+            columns = {'id': Topic.id, 'created_at': Topic.created_at}
+            for name in fields:
+                columns.update((c.key, c) for c in TOPIC_FIELDS[name][0])
+            query = Topic.query.options(load_only(*columns.values()))
+            page, next_cursor = keyset_page(query, Topic, request.args.get('after'), limit)
+            if 'structure' in fields or 'examples' in fields:
+                ensure_rendered(page)
+            response = jsonify([
+                {name: TOPIC_FIELDS[name][1](t) for name in fields}
+                for t in page
+            ])
+            return set_next_cursor(response, next_cursor)
 
+    except APIError:
+        raise
     except Exception as e:
         logger.error(f"Topics API xatolik: {e}")
         logger.error(traceback.format_exc())
@@ -354,17 +669,23 @@ def topics():
 
 # --- API: 1ta topic tafsiloti ---
 @app.route('/api/topics/<int:topic_id>')
+@cached_response('topics')
 def topic_detail(topic_id):
     try:
         t = Topic.query.get_or_404(topic_id)
+        ensure_rendered([t])
         return jsonify({
             'id': t.id,
             'title': t.title,
-            'structure': format_sentences(t.structure),
-            'examples': format_sentences(t.examples),
+            'structure': t.structure_html,
+            'examples': t.examples_html,
             'image_url': t.image_url,
+            'image_srcset': derivatives.srcset(t.image_url),
             'video_url': t.video_url
         })
+    except HTTPException:
+        # get_or_404 - oddiy 404 javobi, server xatoligi emas
+        raise
     except Exception as e:
         logger.error(f"Topic detail xatolik: {e}")
         logger.error(traceback.format_exc())
@@ -377,6 +698,7 @@ def delete_topic(topic_id):
         topic = Topic.query.get_or_404(topic_id)
         db.session.delete(topic)
         db.session.commit()
+        invalidate_cache('topics')
         return jsonify({'status': 'deleted'})
     except Exception as e:
         db.session.rollback()
@@ -385,6 +707,7 @@ def delete_topic(topic_id):
         return jsonify({'error': str(e)}), 500
 
 # --- Fayl yuklash endpoint ---
+# Bir martalik yuklash: bo'lakli protokol bilan bir xil saqlash qatlamidan foydalanadi
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     try:
@@ -395,39 +718,197 @@ def upload_file():
         if file.filename == '':
             return jsonify({'error': 'Fayl nomi yo\'q'}), 400
 
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Ruxsat etilmagan fayl turi'}), 400
-
-        # Fayl nomini xavfsiz qilish
-        filename = secure_filename(file.filename)
-        filename = generate_filename(filename)
-        save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        # Path traversal oldini olish
-        if not os.path.abspath(save_path).startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
-            return jsonify({'error': 'Fayl yo\'li noto\'g\'ri'}), 400
-        file.save(save_path)
-        url = f"/static/uploads/{filename}"
-        
-        logger.info(f"Fayl yuklandi: {filename}")
+        ext = file_extension(file.filename)
+        filename, created = storage.store_stream(file.stream, ext)
+        UPLOAD_BYTES.labels('single').inc(request.content_length or 0)
+        url = storage.url_for(filename)
+        if created:
+            derivatives.schedule(url)
+        logger.info(f"Fayl yuklandi: {filename} (yangi: {created})")
         return jsonify({'url': url})
 
+    except UploadError:
+        raise
     except Exception as e:
         logger.error(f"Fayl yuklash xatolik: {e}")
         logger.error(traceback.format_exc())
         return jsonify({'error': 'Server xatolik', 'details': str(e)}), 500
 
+# --- Bo'lakli (davom ettiriladigan) yuklash ---
+@app.route('/api/uploads', methods=['POST'])
+def upload_init():
+    """Yuklash sessiyasini ochish; xeshi ma'lum fayl mavjud bo'lsa darhol URL qaytariladi"""
+    data = request.json or {}
+    ext = file_extension(data.get('filename'))
+    sha256 = (data.get('sha256') or '').lower()
+    if sha256:
+        if not valid_sha256(sha256):
+            raise UploadError('sha256 noto\'g\'ri')
+        existing = storage.find(sha256, ext)
+        if existing:
+            return jsonify({'url': storage.url_for(existing), 'complete': True})
+    session = storage.init_session(data.get('filename'), data.get('size'))
+    return jsonify(session), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Uzilgan yuklashni davom ettirish uchun joriy offset"""
+    return jsonify(storage.session(upload_id))
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        raise UploadError('offset ko\'rsatilmagan')
+    new_offset = storage.write_chunk(upload_id, offset, request.stream, request.content_length)
+    UPLOAD_BYTES.labels('chunk').inc(new_offset - offset)
+    return jsonify({'upload_id': upload_id, 'offset': new_offset})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def upload_complete(upload_id):
+    data = request.get_json(silent=True) or {}
+    filename, created = storage.complete(upload_id, (data.get('sha256') or '').lower() or None)
+    url = storage.url_for(filename)
+    if created:
+        derivatives.schedule(url)
+    logger.info(f"Bo'lakli yuklash tugadi: {filename} (yangi: {created})")
+    return jsonify({'url': url, 'complete': True})
+
+# --- Rasm variantlari (birinchi so'rovda yaratiladi) ---
+@app.route('/media/<name>')
+def media_variant(name):
+    result = derivatives.ensure(name)
+    if result is None:
+        return jsonify({'error': 'Not found'}), 404
+    path, is_variant = result
+    if not is_variant:
+        # Variant hali yo'q - asl rasm keshlanmaydi, keyingi so'rov tayyor variantni oladi
+        response = send_from_directory(derivatives.upload_root, os.path.basename(path))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    response = send_from_directory(derivatives.derived_root, name, max_age=31536000)
+    # Nom kontent xeshidan olingan - fayl hech qachon o'zgarmaydi
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def upload_abort(upload_id):
+    storage.abort(upload_id)
+    return jsonify({'status': 'deleted'})
+
 # --- HTML sahifa uchun route ---
 @app.route('/')
 def index():
     return render_template('index.html', topic=None)
 
+# --- Foydalanuvchilar soni: keshdagi hisoblagich ---
+# save_contact yangi yozuvda oshiradi, o'qish O(1). Kalit muddati tugaganda
+# (yoki Redis tozalanganda) qiymat COUNT orqali qaytadan olinadi.
+USERS_COUNT_KEY = 'stats:users_count'
+USERS_COUNT_RESYNC = 3600
+STATS_BROADCAST_INTERVAL = int(os.getenv('STATS_BROADCAST_INTERVAL', 30))
+
+def get_users_count():
+    count = cache.get(USERS_COUNT_KEY)
+    if count is None:
+        count = Contact.query.count()
+        # add - parallel increment_users_count natijasini ustidan yozmaydi
+        cache.add(USERS_COUNT_KEY, count, timeout=USERS_COUNT_RESYNC)
+        count = cache.get(USERS_COUNT_KEY) or count
+    return int(count)
+
+# Kalit bo'lsa INCR (TTL saqlanadi); yo'q bo'lsa hech narsa - muddatsiz kalit yaratilmaydi
+INCR_IF_EXISTS = "if redis.call('EXISTS', KEYS[1]) == 1 then return redis.call('INCR', KEYS[1]) end return false"
+
+def increment_users_count():
+    try:
+        # Hisoblagich hali yo'q bo'lsa keyingi o'qishda COUNT orqali olinadi
+        backend = cache.cache
+        client = getattr(backend, '_write_client', None)
+        if client is not None:
+            # get + inc orasida kalit muddati tugashi mumkin - tekshiruv va INCR bitta skriptda
+            client.eval(INCR_IF_EXISTS, 1, (backend.key_prefix or '') + USERS_COUNT_KEY)
+        elif cache.get(USERS_COUNT_KEY) is not None:
+            # SimpleCache: get va inc orasida greenthread almashmaydi
+            backend.inc(USERS_COUNT_KEY)
+    except Exception as e:
+        logger.error(f"Foydalanuvchilar hisoblagichi xatolik: {e}")
+
+_stats_broadcaster_started = False
+# Bir nechta workerda faqat bitta broadcaster yuboradi (aks holda emit N marta takrorlanadi)
+STATS_LEADER_KEY = 'stats:broadcaster_leader'
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def is_stats_leader():
+    """Lease: kalit bo'sh bo'lsa egallash, o'zimizniki bo'lsa muddatini uzaytirish"""
+    lease = STATS_BROADCAST_INTERVAL * 3
+    if cache.add(STATS_LEADER_KEY, WORKER_ID, timeout=lease):
+        return True
+    if cache.get(STATS_LEADER_KEY) == WORKER_ID:
+        cache.set(STATS_LEADER_KEY, WORKER_ID, timeout=lease)
+        return True
+    return False
+
+def stats_broadcaster():
+    """Har STATS_BROADCAST_INTERVAL soniyada bir marta, faqat qiymat o'zgarganda yuborish"""
+    last_sent = None
+    while True:
+        socketio.sleep(STATS_BROADCAST_INTERVAL)
+        try:
+            if not is_stats_leader():
+                last_sent = None
+                continue
+            with app.app_context():
+                users_count = get_users_count()
+            if users_count != last_sent:
+                socketio.emit('stats_update', {'users_count': users_count})
+                last_sent = users_count
+        except Exception as e:
+            logger.error(f"Statistika yuborishda xatolik: {e}")
+
+def start_stats_broadcaster():
+    global _stats_broadcaster_started
+    if not _stats_broadcaster_started:
+        _stats_broadcaster_started = True
+        socketio.start_background_task(stats_broadcaster)
+
 # --- Statistika endpoint ---
 @app.route('/api/stats')
 def stats():
-    users_count = Contact.query.count()
-    stats_data = {'users_count': users_count}
-    socketio.emit('stats_update', stats_data)
-    return jsonify(stats_data)
+    return jsonify({'users_count': get_users_count()})
+
+# --- API: ro'yxatdan o'tgan user_id lar (bot keshini to'ldirish uchun) ---
+MAX_CONTACT_IDS_LIMIT = 10000
+
+@app.route('/api/contacts/ids')
+@require_api_key
+def contact_ids():
+    limit = parse_limit(1000, MAX_CONTACT_IDS_LIMIT)
+    query = db.session.query(Contact.user_id).filter(Contact.user_id.isnot(None))
+    if request.args.get('active') == '1':
+        # Ommaviy yuborish uchun: botni bloklaganlar o'tkazib yuboriladi
+        query = query.filter(Contact.blocked_at.is_(None))
+    after = request.args.get('after', type=int)
+    if after is not None:
+        query = query.filter(Contact.user_id > after)
+    # user_id unikal indeksi bo'yicha keyset - faqat indeksdan o'qiladi
+    ids = [row[0] for row in query.order_by(Contact.user_id).limit(limit).all()]
+    return jsonify({
+        'ids': ids,
+        'next': ids[-1] if len(ids) == limit else None
+    })
+
+# --- API: foydalanuvchi botni bloklaganini belgilash ---
+@app.route('/api/contacts/<int:user_id>/blocked', methods=['POST'])
+@require_api_key
+def block_contact(user_id):
+    updated = (
+        Contact.query.filter_by(user_id=user_id, blocked_at=None)
+        .update({'blocked_at': datetime.utcnow()}, synchronize_session=False)
+    )
+    db.session.commit()
+    return jsonify({'status': 'ok', 'updated': updated})
 
 # --- API: contact mavjudligini tekshirish ---
 @app.route('/api/contacts/<int:user_id>')
@@ -439,6 +920,7 @@ def get_contact(user_id):
 
 # --- API: barcha yangiliklar ---
 @app.route('/api/news', methods=['GET', 'POST'])
+@cached_response('news', 'topics')
 def get_news():
     try:
         if request.method == 'POST':
@@ -452,6 +934,7 @@ def get_news():
             )
             db.session.add(news)
             db.session.commit()
+            invalidate_cache('news')
             
             # Emit socket event for new news
             socketio.emit('news_update', {
@@ -487,6 +970,7 @@ def delete_news(news_id):
         news = News.query.get_or_404(news_id)
         db.session.delete(news)
         db.session.commit()
+        invalidate_cache('news')
         return jsonify({'status': 'deleted'})
     except Exception as e:
         db.session.rollback()
@@ -496,10 +980,12 @@ def delete_news(news_id):
 
 # --- API: barcha feedbacklar va yangi sharh qabul qilish ---
 @app.route('/api/feedback', methods=['GET', 'POST'])
+@cached_response('feedback', 'topics', 'contacts')
 def feedback():
     if request.method == 'POST':
         data = request.json
-        print('FEEDBACK POST DATA:', data)
+        # Tana logga yozilmaydi (foydalanuvchi matni) - faqat identifikatorlar
+        logger.debug(f"Feedback POST: topic_id={data.get('topic_id')!r}, sharh {len(data.get('comment') or '')} belgi")
         user_id = data.get('user_id')
         topic_id = data.get('topic_id')
         comment = data.get('comment')
@@ -514,67 +1000,180 @@ def feedback():
             topic_id_int = int(topic_id)
             topic_id = topic_id_int
         except Exception:
-            print('FEEDBACK ERROR: topic_id not integer')
+            logger.warning("Feedback: topic_id butun son emas")
             return jsonify({'error': "Mavzu ID noto'g'ri"}), 400
         if not all([topic_id, comment]) or (not user_id and not user_name):
-            print('FEEDBACK ERROR: Majburiy maydonlar yo\'q')
+            logger.warning("Feedback: majburiy maydonlar yo'q")
             return jsonify({'error': 'Majburiy maydonlar toldirilmagan'}), 400
         try:
             fb = Feedback(user_id=user_id, user_name=user_name, topic_id=topic_id, comment=comment)
             db.session.add(fb)
             db.session.commit()
+            invalidate_cache('feedback')
             
             # Emit socket event for new feedback
-            socketio.emit('feedback_update', {
-                'id': fb.id,
-                'user': user_name or (Contact.query.filter_by(user_id=user_id).first().first_name if user_id else 'Foydalanuvchi'),
-                'topic': Topic.query.get(topic_id).title,
-                'comment': comment,
-                'created_at': fb.created_at.strftime('%Y-%m-%d')
-            })
+            row = feedback_query().filter(Feedback.id == fb.id).one()
+            socketio.emit('feedback_update', serialize_feedback(row))
             
-            print('FEEDBACK SUCCESS')
+            logger.debug(f"Feedback saqlandi: {fb.id}")
             return jsonify({'status': 'ok'})
         except Exception as e:
-            import traceback
             db.session.rollback()
-            print('FEEDBACK ERROR:', e)
-            print(traceback.format_exc())
             logger.error(f'FEEDBACK ERROR: {e}')
             logger.error(traceback.format_exc())
             return jsonify({'error': 'Sharh saqlanmadi', 'details': str(e)}), 500
     else:
-        feedbacks = Feedback.query.order_by(Feedback.created_at.desc()).limit(5).all()
-        result = []
-        for f in feedbacks:
-            if f.user_id:
-                user = Contact.query.filter_by(user_id=f.user_id).first()
-                user_display = user.first_name if user else 'Foydalanuvchi'
-            else:
-                user_display = f.user_name or 'Foydalanuvchi'
-            topic = Topic.query.filter_by(id=f.topic_id).first()
-            result.append({
-                'id': f.id,
-                'user': user_display,
-                'topic': topic.title if topic else 'Mavzu',
-                'comment': f.comment,
-                'created_at': f.created_at.strftime('%Y-%m-%d')
-            })
-        return jsonify(result)
+        limit = parse_limit(DEFAULT_FEEDBACK_LIMIT, MAX_FEEDBACK_LIMIT)
+        rows, next_cursor = keyset_page(
+            feedback_query(), Feedback, request.args.get('after'), limit,
+            entity=lambda row: row[0]
+        )
+        response = jsonify([serialize_feedback(row) for row in rows])
+        return set_next_cursor(response, next_cursor)
 
 # WebSocket handlers
 @socketio.on('connect')
 def handle_connect():
     logger.info("Client connected")
+    socket_clients.add(request.sid)
+    SOCKET_CONNECTIONS.inc()
+    start_stats_broadcaster()
     emit('connected', {'data': 'Connected'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    if request.sid in socket_clients:
+        socket_clients.discard(request.sid)
+        SOCKET_CONNECTIONS.dec()
     logger.info("Client disconnected")
 
-# --- App ishga tushishi ---
-with app.app_context():
-    db.create_all()
+# --- To'xtash (drain) ---
+# SIGTERM da worker yangi ulanish qabul qilmaydi, /ready 503 qaytaradi, jarayondagi
+# so'rovlar tugashini kutadi va Socket.IO mijozlarini DRAIN_SOCKET_SPREAD ga yoyib
+# uzadi - ular bir vaqtda emas, asta-sekin yangi workerga qayta ulanadi.
+DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', 30))
+DRAIN_SOCKET_SPREAD = min(5.0, DRAIN_TIMEOUT / 2)
+draining = False
+active_requests = 0
+socket_clients = set()
+
+@app.before_request
+def _count_request():
+    global active_requests
+    active_requests += 1
+    g.counted = True
+
+@app.teardown_request
+def _uncount_request(exc):
+    global active_requests
+    if g.pop('counted', False):
+        active_requests -= 1
+
+# Yopilgandan keyin yangi qabul qilingan ulanishlar so'rov qatorini o'qib ulgurishi uchun
+DRAIN_ACCEPT_GRACE = 1.0
+
+class DrainableListener:
+    """Tinglovchi soket: close() uni darhol SO_REUSEPORT guruhidan chiqaradi, lekin
+    wsgi.server ning accept siklini to'xtatmaydi. wsgi.server sikldan chiqqach bo'sh
+    (so'rov qatori hali o'qilmagan) ulanishlarni yopadi - hozirgina qabul qilinganlarni
+    ham, shuning uchun drain() uni so'rovlar tugagandan keyin server.kill bilan to'xtatadi."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._pending = []
+
+    def close(self):
+        # Yadro navbatida turgan ulanishlar yopishda uziladi - avval ularni olib qolamiz
+        raw = self.sock.fd
+        while True:
+            try:
+                conn, addr = raw.accept()
+            except OSError:
+                break
+            self._pending.append((type(self.sock)(conn), addr))
+        self.sock.close()
+
+    def accept(self):
+        if self._pending:
+            return self._pending.pop(0)
+        try:
+            return self.sock.accept()
+        except OSError:
+            if not draining:
+                raise
+        if self._pending:
+            return self._pending.pop(0)
+        # drain() server.kill(SystemExit) bilan to'xtatguncha kutish
+        eventlet.event.Event().wait()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+def drain(server, listener):
+    global draining
+    if draining:
+        return
+    draining = True
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    logger.info(f"Drain boshlandi: {active_requests} so'rov, {len(socket_clients)} socket")
+    # Avval tinglovchi soket yopiladi - yadro yangi ulanishlarni faqat yangi workerga beradi.
+    # Yopilgan soketda kutayotgan accept uyg'onmaydi; EBADF ni wsgi.server o'tkazib yuboradi
+    # va sikl navbatdan olingan ulanishlarni qabul qilishda davom etadi
+    listener.close()
+    server.kill(OSError(errno.EBADF, 'listener closed'))
+    try:
+        if cache.get(STATS_LEADER_KEY) == WORKER_ID:
+            cache.delete(STATS_LEADER_KEY)
+    except Exception as e:
+        logger.error(f"Statistika lease ni bo'shatib bo'lmadi: {e}")
+    eventlet.sleep(DRAIN_ACCEPT_GRACE)
+
+    sids = list(socket_clients)
+    random.shuffle(sids)
+    pause = DRAIN_SOCKET_SPREAD / len(sids) if sids else 0
+    for i, sid in enumerate(sids):
+        if i:
+            eventlet.sleep(pause)
+        socketio.server.disconnect(sid, namespace='/')
+    while active_requests > 0 and time.monotonic() < deadline:
+        eventlet.sleep(0.1)
+    # Accept sikli tugaydi, wsgi.server bo'sh keep-alive ulanishlarni yopib qolganlarini kutadi
+    server.kill(SystemExit)
+    with eventlet.Timeout(max(0.0, deadline - time.monotonic()), False):
+        try:
+            server.wait()
+        except Exception as e:
+            logger.error(f"wsgi server xatolik bilan to'xtadi: {e}")
+    if active_requests > 0:
+        logger.warning(f"Drain muddati tugadi, {active_requests} so'rov uzildi")
+    logger.info("Drain tugadi, worker to'xtadi")
+    logging.shutdown()
+    os._exit(0)
+
+def _wake_on_signal():
+    """Bo'sh workerda hub epoll da uzoq uxlaydi va signal handler rejalashtirgan drain
+    keyingi hodisagacha kechikadi. Wakeup fd orqali signal kelishi bilan hub uyg'onadi."""
+    from eventlet.hubs import trampoline
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+    signal.set_wakeup_fd(write_fd)
+
+    def reader():
+        while True:
+            trampoline(read_fd, read=True)
+            os.read(read_fd, 512)
+    eventlet.spawn_n(reader)
+
+def serve(host, port):
+    """SO_REUSEPORT bilan tinglash: rolling reload da yangi worker eski bilan bir portda turadi"""
+    import eventlet.wsgi
+    listener = DrainableListener(eventlet.listen((host, port), reuse_port=True))
+    server = eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=False)
+    signal.signal(signal.SIGTERM, lambda *_: eventlet.spawn_n(drain, server, listener))
+    _wake_on_signal()
+    logger.info(f"Web worker {os.getpid()} {host}:{port} da ishga tushdi")
+    server.wait()
 
 if __name__ == '__main__':
-    socketio.run(app, debug=False)
+    # Supervisor bir nechta workerni PORT orqali turli portlarda ishga tushiradi
+    serve(os.getenv('HOST', '127.0.0.1'), int(os.getenv('PORT', 5000)))
@@ -0,0 +1,104 @@
+"""Statik fayllarni kontent xeshi bilan nomlash va oldindan siqish.
+
+build_assets() static/app.js va static/style.css dan static/dist/ ichida
+app.<xesh>.js kabi nusxalar, ularning .gz va .br variantlarini hamda
+manifest.json ni yaratadi. Shablonda fayllar asset_url('app.js') orqali
+ulanadi, shuning uchun har bir o'zgarish yangi URL beradi va /assets/
+ostidagi fayllarni bir yil (immutable) keshlash xavfsiz bo'ladi. Siqilgan
+variant Accept-Encoding bo'yicha tanlanadi - so'rov paytida siqish yo'q.
+
+Oldingi build fayllari o'chirilmaydi va /assets/ ular uchun ham javob beradi:
+deploydan oldin yuklangan sahifa (yoki hali yangilanmagan worker) eski URL ni
+so'raganda 404 olmaydi. HTML sahifaning o'zi no-cache bilan beriladi.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+
+from flask import abort, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # Brotli o'rnatilmagan bo'lsa faqat .gz yaratiladi
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSETS = ('app.js', 'style.css')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# build_assets() yaratadigan nom: app.<12 ta hex>.js
+HASHED_NAME = re.compile(r'[\w-]+\.[0-9a-f]{12}\.(?:js|css)')
+# Accept-Encoding: afzallik tartibida (kodlash, fayl qo'shimchasi)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_assets(static_folder):
+    """Xeshlangan va siqilgan nusxalarni yaratish; manifestni qaytarish"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in ASSETS:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        path = os.path.join(dist, hashed)
+        # Nom kontentdan olingani uchun mavjud fayl qayta yozilmaydi
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+            # mtime=0 - bir xil kontent uchun bir xil .gz baytlari
+            _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_atomic(path + '.br', brotli.compress(data, quality=11))
+            logger.info(f"Statik fayl tayyorlandi: {hashed}")
+        manifest[name] = hashed
+    _write_atomic(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+def init_assets(app):
+    dist = os.path.join(app.static_folder, DIST_DIR)
+    manifest = build_assets(app.static_folder)
+
+    @app.context_processor
+    def _asset_helpers():
+        def asset_url(name):
+            hashed = manifest.get(name)
+            return f"/assets/{hashed}" if hashed else f"/static/{name}"
+        return {'asset_url': asset_url}
+
+    @app.route('/assets/<path:filename>')
+    def hashed_asset(filename):
+        # Faqat joriy manifest emas - dist/ dagi istalgan build fayli
+        if not HASHED_NAME.fullmatch(filename) or not os.path.isfile(os.path.join(dist, filename)):
+            abort(404)
+        mimetype = 'text/css' if filename.endswith('.css') else 'application/javascript'
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.exists(os.path.join(dist, filename + suffix)):
+                response = send_from_directory(dist, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(dist, filename, mimetype=mimetype)
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Statik fayllarni xeshlash va oldindan siqish"""
+        for name, hashed in build_assets(app.static_folder).items():
+            print(f"{name} -> {DIST_DIR}/{hashed}")
+
+    return manifest
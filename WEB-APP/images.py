@@ -0,0 +1,201 @@
+"""Yuklangan rasmlar uchun kichraytirilgan variantlar (WebP/JPEG, bir nechta kenglik).
+
+Variantlar eventlet tpool ning OS oqimlarida yaratiladi (bir vaqtda IMAGE_WORKERS
+tagacha), shuning uchun rasmni qayta ishlash eventlet siklini to'xtatib
+qo'ymaydi. Monkey patch qilingan workerda ProcessPoolExecutor ishlatilmaydi:
+uning boshqaruv oqimi va pipe lari green bo'lib qoladi va fork osilib qolishi
+mumkin. Rasm
+yuklanganda barcha variantlar fonda navbatga qo'yiladi; biror variant hali
+yo'q bo'lsa u birinchi so'rovda yaratiladi. Variant nomi manba fayl nomidan
+(kontent xeshi) olinadi, shuning uchun ular hech qachon o'zgarmaydi.
+
+Manba kengligi ham o'zgarmaydi: variant kengliklari bir marta hisoblanib
+derived papkasida (<xesh>.widths) va xotirada saqlanadi, ro'yxatlar har
+so'rovda rasm faylini ochmaydi. Variant muddatida yaratilmasa yoki xato
+bersa asl rasm qaytariladi.
+"""
+import logging
+import os
+import re
+
+import eventlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1080)
+# kengaytma: (Pillow formati, MIME turi)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+SOURCE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+VARIANT_QUALITY = 80
+# Birinchi so'rovda variant yaratilishini kutish chegarasi (soniya)
+RENDER_TIMEOUT = 30
+
+_SOURCE_RE = re.compile(r'^([0-9a-f]{32,64})\.([a-z]+)$')
+_VARIANT_RE = re.compile(r'^([0-9a-f]{32,64})-(\d+)\.([a-z]+)$')
+
+
+def render_variant(src_path, dest_path, width, fmt):
+    """Bitta variantni yaratish (tpool oqimida bajariladi)"""
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            im.thumbnail((width, im.height * width // im.width + 1), Image.LANCZOS)
+        if fmt == 'JPEG' or im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGB' if fmt == 'JPEG' else 'RGBA')
+        tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+        options = {'quality': VARIANT_QUALITY}
+        if fmt == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+        im.save(tmp_path, fmt, **options)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+class ImageDerivatives:
+    def __init__(self, upload_root, upload_prefix, derived_root, derived_prefix, max_workers=None):
+        self.upload_root = upload_root
+        self.upload_prefix = upload_prefix.rstrip('/') + '/'
+        self.derived_root = derived_root
+        self.derived_prefix = derived_prefix.rstrip('/')
+        self.max_workers = max_workers or int(os.getenv('IMAGE_WORKERS', 2))
+        # Bir vaqtda ishlaydigan renderlar soni (tpool oqimlari boshqa ishlar uchun ham kerak)
+        self._slots = Semaphore(self.max_workers)
+        # variant nomi -> render qilayotgan greenthread
+        self._pending = {}
+        # kalit -> variant kengliklari (kontent xeshi bo'yicha - hech qachon eskirmaydi)
+        self._width_cache = {}
+        os.makedirs(derived_root, exist_ok=True)
+
+    def _render(self, name, src_path, dest_path, width, fmt):
+        try:
+            with self._slots:
+                tpool.execute(render_variant, src_path, dest_path, width, fmt)
+        except Exception as e:
+            logger.error(f"Variantni yaratib bo'lmadi {name}: {e}")
+        finally:
+            self._pending.pop(name, None)
+
+    def _source(self, url):
+        """Mahalliy yuklangan rasm URL idan (kalit, manba yo'li)"""
+        if not url or not url.startswith(self.upload_prefix):
+            return None
+        match = _SOURCE_RE.match(url[len(self.upload_prefix):])
+        if not match or match.group(2) not in SOURCE_EXTENSIONS:
+            return None
+        path = os.path.join(self.upload_root, match.group(0))
+        return (match.group(1), path) if os.path.exists(path) else None
+
+    def _widths(self, key, src_path):
+        widths = self._width_cache.get(key)
+        if widths is not None:
+            return widths
+        cache_path = os.path.join(self.derived_root, f"{key}.widths")
+        try:
+            with open(cache_path) as f:
+                widths = [int(w) for w in f.read().split()]
+        except (OSError, ValueError):
+            widths = self._read_widths(src_path)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(' '.join(map(str, widths)))
+            os.replace(tmp_path, cache_path)
+        self._width_cache[key] = widths
+        return widths
+
+    @staticmethod
+    def _read_widths(src_path):
+        # Image.open faqat sarlavhani o'qiydi; asl o'lchamdan katta variant berilmaydi
+        try:
+            with Image.open(src_path) as im:
+                width = im.width
+        except Exception as e:
+            # O'qilmaydigan rasm ham keshlanadi - har so'rovda qayta ochilmaydi
+            logger.error(f"Rasmni o'qib bo'lmadi {src_path}: {e}")
+            return []
+        widths = [w for w in VARIANT_WIDTHS if w < width]
+        if width <= VARIANT_WIDTHS[-1]:
+            # Kichik rasm: asl kenglikda faqat qayta siqilgan variant
+            widths.append(width)
+        return widths
+
+    def srcset(self, url):
+        """Topic API uchun variantlar ro'yxati: [{'url', 'width', 'type'}]"""
+        source = self._source(url)
+        if not source:
+            return []
+        key, src_path = source
+        widths = self._widths(key, src_path)
+        return [
+            {
+                'url': f"{self.derived_prefix}/{key}-{width}.{ext}",
+                'width': width,
+                'type': mime,
+            }
+            for ext, (_, mime) in VARIANT_FORMATS.items()
+            for width in widths
+        ]
+
+    def _submit(self, key, src_path, width, ext):
+        name = f"{key}-{width}.{ext}"
+        dest_path = os.path.join(self.derived_root, name)
+        if os.path.exists(dest_path):
+            return None
+        job = self._pending.get(name)
+        if job is None:
+            job = eventlet.spawn(self._render, name, src_path, dest_path, width, VARIANT_FORMATS[ext][0])
+            self._pending[name] = job
+        return job
+
+    def schedule(self, url):
+        """Yangi yuklangan rasmning barcha variantlarini fonda navbatga qo'yish"""
+        source = self._source(url)
+        if not source:
+            return
+        key, src_path = source
+        for width in self._widths(key, src_path):
+            for ext in VARIANT_FORMATS:
+                self._submit(key, src_path, width, ext)
+
+    def ensure(self, name):
+        """(fayl yo'li, variantmi); yo'q bo'lsa yaratib kutiladi. Noto'g'ri nom - None.
+
+        Variant RENDER_TIMEOUT ichida tayyor bo'lmasa yoki xato bersa asl rasm
+        (variantmi=False) qaytariladi - render fonda davom etadi.
+        """
+        match = _VARIANT_RE.match(name)
+        if not match:
+            return None
+        key, width, ext = match.group(1), int(match.group(2)), match.group(3)
+        if ext not in VARIANT_FORMATS:
+            return None
+        dest_path = os.path.join(self.derived_root, name)
+        if os.path.exists(dest_path):
+            return dest_path, True
+        src_path = None
+        for src_ext in SOURCE_EXTENSIONS:
+            candidate = os.path.join(self.upload_root, f"{key}.{src_ext}")
+            if os.path.exists(candidate):
+                src_path = candidate
+                break
+        if src_path is None or width not in self._widths(key, src_path):
+            return None
+        job = self._submit(key, src_path, width, ext)
+        if job is None:
+            return dest_path, True
+        # Timeout faqat shu so'rovning kutishini to'xtatadi, render fonda davom etadi
+        with eventlet.Timeout(RENDER_TIMEOUT, False):
+            job.wait()
+        if os.path.exists(dest_path):
+            return dest_path, True
+        if not job.dead:
+            logger.warning(f"Variant {RENDER_TIMEOUT}s ichida tayyor bo'lmadi: {name}")
+        # Xatolik _render da logga yozilgan
+        return src_path, False
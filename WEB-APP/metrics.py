@@ -0,0 +1,120 @@
+"""Web ilova uchun Prometheus metrikalari (/metrics).
+
+- so'rovlar: route bo'yicha kechikish histogrammasi va status hisoblagichi;
+- DB puli: ulanish olishni kutish vaqti va band ulanishlar soni;
+- Socket.IO: faol ulanishlar va hodisa bo'yicha emitlar;
+- yuklangan baytlar.
+
+main.py ostida har bir worker o'z portida (PORT, PORT+1, ...) o'z metrikalarini
+beradi. gunicorn -w N da barcha workerlar bitta portda, shuning uchun
+PROMETHEUS_MULTIPROC_DIR berilishi kerak: har bir jarayon qiymatlarini shu
+papkaga yozadi va /metrics barcha workerlar yig'indisini qaytaradi. Papka
+ishga tushishdan oldin tozalanadi (Procfile).
+
+/metrics faqat METRICS_TOKEN berilganda ochiq va
+"Authorization: Bearer <METRICS_TOKEN>" talab qiladi, aks holda 404.
+"""
+import atexit
+import hmac
+import os
+import time
+
+from flask import Response, abort, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+# prometheus_client rejimni import paytida tanlaydi - shu sababli .env dan emas, jarayon muhitidan
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+REQUEST_LATENCY = Histogram(
+    'web_request_duration_seconds', 'HTTP so\'rov kechikishi', ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter('web_requests_total', 'HTTP so\'rovlar', ['method', 'route', 'status'])
+DB_CHECKOUT_WAIT = Histogram(
+    'web_db_pool_checkout_seconds', 'Puldan ulanish olishni kutish',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+# Gauge lar hodisalarda o'zgartiriladi (set_function multiprocess rejimida ishlamaydi);
+# livesum - tirik workerlar qiymatlari yig'indisi
+DB_IN_USE = Gauge('web_db_pool_in_use', 'Puldan olingan (band) ulanishlar', multiprocess_mode='livesum')
+DB_POOL_SIZE = Gauge('web_db_pool_size', 'Puldagi ochiq ulanishlar', multiprocess_mode='livesum')
+SOCKET_CONNECTIONS = Gauge('web_socketio_connections', 'Faol Socket.IO ulanishlari', multiprocess_mode='livesum')
+SOCKET_EMITS = Counter('web_socketio_emits_total', 'Socket.IO emitlari', ['event'])
+UPLOAD_BYTES = Counter('web_upload_bytes_total', 'Yuklangan baytlar', ['kind'])
+
+
+def _instrument_pool(engine):
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            DB_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+    # Engine ulanishni pool.connect() orqali oladi - shu nusxa atributi yetarli
+    pool.connect = timed_connect
+
+    event.listen(pool, 'checkout', lambda *_: DB_IN_USE.inc())
+    event.listen(pool, 'checkin', lambda *_: DB_IN_USE.dec())
+    event.listen(pool, 'connect', lambda *_: DB_POOL_SIZE.inc())
+    # Puldan chiqarilgan (detach) ulanish yopilganda close emas, close_detached keladi
+    event.listen(pool, 'close', lambda *_: DB_POOL_SIZE.dec())
+    event.listen(pool, 'detach', lambda *_: DB_POOL_SIZE.dec())
+
+
+def _instrument_socketio(socketio):
+    emit = socketio.emit
+
+    def counted_emit(event, *args, **kwargs):
+        SOCKET_EMITS.labels(event).inc()
+        return emit(event, *args, **kwargs)
+
+    socketio.emit = counted_emit
+
+
+def _registry():
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def init_metrics(app, db, socketio):
+    """SOCKET_CONNECTIONS ni ilova connect/disconnect handlerlari o'zgartiradi"""
+    with app.app_context():
+        # Engine obyekti yaratiladi, lekin ulanish ochilmaydi
+        _instrument_pool(db.engine)
+    _instrument_socketio(socketio)
+    # init_metrics load_dotenv dan keyin chaqiriladi
+    token = os.getenv('METRICS_TOKEN')
+    if MULTIPROC_DIR:
+        # To'xtagan worker gauge qiymatlari yig'indidan chiqariladi
+        atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+    @app.before_request
+    def _start_metrics_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        # Yo'l emas, shablon - /api/topics/<int:topic_id> bitta qator bo'lib qoladi
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+        REQUESTS.labels(request.method, route, response.status_code).inc()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(404)
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST, headers={'Cache-Control': 'no-store'})
@@ -0,0 +1,145 @@
+"""Ma'lumotlar bazasi sxemasi uchun oddiy versiyali migratsiyalar.
+
+db.create_all() faqat yangi jadvallarni yaratadi va mavjud jadvallarga
+ustun yoki indeks qo'shmaydi. Shu sababli jonli bazadagi o'zgarishlar shu
+yerda tartib raqami bilan yoziladi va schema_migrations jadvalida qaysi
+versiyalar qo'llangani saqlanadi. Har bir qadam idempotent: create_all
+allaqachon yaratgan ustun yoki indeks qayta yaratilmaydi.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String(255)),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn, table):
+    return {i['name'] for i in inspect(conn).get_indexes(table)}
+
+
+def _add_column(conn, table, name, ddl):
+    if name not in _columns(conn, table):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+        logger.info(f"Ustun qo'shildi: {table}.{name}")
+
+
+def _drop_column(conn, table, name):
+    if name in _columns(conn, table):
+        conn.execute(text(f'ALTER TABLE {table} DROP COLUMN {name}'))
+
+
+def _create_index(conn, table, name, columns):
+    if name not in _indexes(conn, table):
+        conn.execute(text(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})'))
+        logger.info(f"Indeks yaratildi: {name}")
+
+
+def _drop_index(conn, table, name):
+    if name in _indexes(conn, table):
+        conn.execute(text(f'DROP INDEX {name} ON {table}'))
+
+
+# --- Migratsiyalar ---
+def _topic_render_columns_up(conn):
+    _add_column(conn, 'topic', 'structure_html', 'TEXT')
+    _add_column(conn, 'topic', 'examples_html', 'TEXT')
+    _add_column(conn, 'topic', 'render_version', 'INTEGER DEFAULT 0')
+
+
+def _topic_render_columns_down(conn):
+    for name in ('structure_html', 'examples_html', 'render_version'):
+        _drop_column(conn, 'topic', name)
+
+
+# Ro'yxatlar (created_at, id) bo'yicha kamayish tartibida o'qiladi. InnoDB
+# ikkilamchi indeksga birlamchi kalitni o'zi qo'shadi, shuning uchun
+# created_at indeksi keyset sahifalashni ham to'liq qoplaydi.
+CREATED_AT_INDEXES = [
+    ('topic', 'ix_topic_created_at', ['created_at']),
+    ('news', 'ix_news_created_at', ['created_at']),
+    ('feedback', 'ix_feedback_created_at', ['created_at']),
+    ('feedback', 'ix_feedback_topic_id_created_at', ['topic_id', 'created_at']),
+]
+
+
+def _created_at_indexes_up(conn):
+    for table, name, columns in CREATED_AT_INDEXES:
+        _create_index(conn, table, name, columns)
+
+
+def _created_at_indexes_down(conn):
+    for table, name, _ in CREATED_AT_INDEXES:
+        _drop_index(conn, table, name)
+
+
+def _contact_blocked_at_up(conn):
+    _add_column(conn, 'contact', 'blocked_at', 'DATETIME NULL')
+
+
+def _contact_blocked_at_down(conn):
+    _drop_column(conn, 'contact', 'blocked_at')
+
+
+MIGRATIONS = [
+    # (versiya, tavsif, up, down)
+    (1, 'topic render ustunlari', _topic_render_columns_up, _topic_render_columns_down),
+    (2, 'created_at va feedback indekslari', _created_at_indexes_up, _created_at_indexes_down),
+    (3, 'contact.blocked_at', _contact_blocked_at_up, _contact_blocked_at_down),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(engine):
+    metadata.create_all(engine, tables=[schema_migrations])
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def upgrade(engine, target=None):
+    """Qo'llanmagan migratsiyalarni tartib bilan bajarish; qo'llangan versiyalarni qaytaradi"""
+    target = LATEST_VERSION if target is None else target
+    done = applied_versions(engine)
+    applied = []
+    for version, description, up, _ in MIGRATIONS:
+        if version in done or version > target:
+            continue
+        logger.info(f"Migratsiya {version}: {description}")
+        with engine.begin() as conn:
+            up(conn)
+            try:
+                conn.execute(schema_migrations.insert().values(version=version, description=description))
+            except IntegrityError:
+                # Boshqa worker shu migratsiyani parallel ravishda qo'lladi
+                logger.info(f"Migratsiya {version} allaqachon qo'llangan")
+        applied.append(version)
+    return applied
+
+
+def downgrade(engine, target):
+    """target versiyadan yuqori migratsiyalarni teskari tartibda bekor qilish"""
+    done = applied_versions(engine)
+    reverted = []
+    for version, description, _, down in reversed(MIGRATIONS):
+        if version not in done or version <= target:
+            continue
+        logger.info(f"Migratsiya bekor qilinmoqda {version}: {description}")
+        with engine.begin() as conn:
+            down(conn)
+            conn.execute(schema_migrations.delete().where(schema_migrations.c.version == version))
+        reverted.append(version)
+    return reverted
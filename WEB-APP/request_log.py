@@ -0,0 +1,70 @@
+"""So'rovlarni yengil log qilish.
+
+Har bir so'rov uchun bitta qator yoziladi: metod, route, status va davomiylik.
+Batafsil ma'lumot (sarlavhalar va JSON tana) faqat REQUEST_LOG_SAMPLE_RATE
+ulushidagi so'rovlar uchun yoziladi. multipart va oqimli tanalar hech qachon
+o'qilmaydi; JSON tana hajmi cheklanadi va maxfiy maydonlar yashiriladi.
+"""
+import json
+import os
+import random
+import time
+
+from flask import g, request
+
+SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', 0))
+# Log qilinadigan JSON tanasining maksimal hajmi (belgilarda)
+MAX_BODY_CHARS = int(os.getenv('REQUEST_LOG_MAX_BODY', 2048))
+# Bundan katta JSON so'rovlarning tanasi umuman log qilinmaydi
+MAX_JSON_BYTES = 64 * 1024
+
+REDACTED = '***'
+REDACT_HEADERS = {'authorization', 'cookie', 'x-api-key', 'x-telegram-bot-api-secret-token'}
+REDACT_FIELDS = {'phone_number', 'password', 'token', 'api_key', 'secret', 'access_token'}
+
+
+def redact(value):
+    """JSON qiymat ichidagi maxfiy maydonlarni yashirish"""
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in REDACT_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    return value
+
+
+def _headers():
+    return {k: REDACTED if k.lower() in REDACT_HEADERS else v for k, v in request.headers.items()}
+
+
+def _json_body():
+    if not request.is_json:
+        return None
+    if request.content_length is None or request.content_length > MAX_JSON_BYTES:
+        return '<tana log qilinmadi>'
+    # View allaqachon o'qigan bo'lsa keshdan olinadi
+    body = json.dumps(redact(request.get_json(silent=True)), ensure_ascii=False)
+    if len(body) > MAX_BODY_CHARS:
+        body = body[:MAX_BODY_CHARS] + '...'
+    return body
+
+
+def init_request_logging(app, logger):
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    @app.after_request
+    def _log_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        route = request.url_rule.rule if request.url_rule else request.path
+        logger.info('%s %s %s %.1fms', request.method, route, response.status_code, elapsed_ms)
+        if g.pop('request_sampled', False):
+            logger.info('Headers: %s', _headers())
+            body = _json_body()
+            if body is not None:
+                logger.info('Body: %s', body)
+        return response
@@ -0,0 +1,120 @@
+"""So'rov bo'yicha SQL profiler.
+
+SQLAlchemy cursor hodisalari orqali:
+
+- har bir statement vaqti o'lchanadi; SLOW_QUERY_MS dan uzoq davom etganlari
+  parametrlari yashirilgan holda logga yoziladi (barcha so'rovlarda);
+- SQL_PROFILE_SAMPLE_RATE ulushidagi HTTP so'rovlar uchun statementlar soni,
+  umumiy DB vaqti va shakli (literallarsiz matn) bo'yicha takrorlar sanaladi.
+  Bitta shakl N_PLUS_ONE_THRESHOLD va undan ko'p marta bajarilsa - ehtimoliy
+  N+1 sifatida ogohlantirish yoziladi;
+- debug rejimida (yoki SQL_PROFILE_HEADERS=1) barcha so'rovlar profil qilinadi
+  va javobga X-DB-Queries / X-DB-Time sarlavhalari qo'shiladi.
+
+Parametr qiymatlari hech qachon logga tushmaydi - faqat turi.
+"""
+import os
+import random
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+SAMPLE_RATE = float(os.getenv('SQL_PROFILE_SAMPLE_RATE', 0.05))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+HEADERS = os.getenv('SQL_PROFILE_HEADERS') == '1'
+MAX_STATEMENT_CHARS = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Literallar va IN ro'yxati uzunligidan qat'i nazar bir xil bo'lgan kalit"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def redact_parameters(parameters, executemany=False):
+    """Qiymatlar o'rniga faqat turlari"""
+    if executemany:
+        return f'<{len(parameters)} ta qator>'
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'seconds', 'shapes')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def suspected_n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def init_sql_profiler(app, db, logger):
+    with app.app_context():
+        engine = db.engine
+
+    def always():
+        return app.debug or HEADERS
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            route = request.path if has_request_context() else '-'
+            logger.warning(
+                'Sekin SQL (%.1fms, %s): %s | parametrlar: %s',
+                elapsed * 1000, route, _SPACE.sub(' ', statement)[:MAX_STATEMENT_CHARS],
+                redact_parameters(parameters, executemany),
+            )
+        profile = g.get('sql_profile') if has_request_context() else None
+        if profile is not None:
+            profile.queries += 1
+            profile.seconds += elapsed
+            profile.shapes[statement_shape(statement)] += 1
+
+    @event.listens_for(engine, 'handle_error')
+    def _discard_query_timer(context):
+        # Xatolikda after_cursor_execute chaqirilmaydi - boshlanish vaqtini tashlab yuborish
+        stack = context.connection.info.get('query_started') if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    @app.before_request
+    def _start_sql_profile():
+        if always() or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE):
+            g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def _report_sql_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else request.path
+        for shape, n in profile.suspected_n_plus_one():
+            logger.warning('Ehtimoliy N+1 (%s %s): %dx %s', request.method, route, n, shape[:MAX_STATEMENT_CHARS])
+        if profile.queries:
+            logger.debug('SQL %s %s: %d ta, %.1fms', request.method, route, profile.queries, profile.seconds * 1000)
+        if always():
+            response.headers['X-DB-Queries'] = str(profile.queries)
+            response.headers['X-DB-Time'] = f'{profile.seconds * 1000:.1f}ms'
+        return response
@@ -102,12 +102,36 @@ async function apiCall(url, options = {}) {
     }
 }
 
+// Mavzular ro'yxatini sahifalab yuklash (faqat id va title, matnlar showTopic orqali)
+async function fetchTopicList() {
+    let topics = [];
+    let cursor = null;
+    do {
+        const params = new URLSearchParams({ fields: 'id,title', limit: '200' });
+        if (cursor) params.set('after', cursor);
+        const response = await fetch(`/api/topics?${params}`);
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Server xatolik');
+        }
+        topics = topics.concat(await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return topics;
+}
+
+function updateTopicsCount() {
+    const topics = document.getElementById('stats-topics');
+    if (topics) topics.textContent = allTopics.length;
+}
+
 // Load topics with error handling
 async function loadTopics() {
     try {
-        const topics = await apiCall('/api/topics');
+        const topics = await fetchTopicList();
         allTopics = topics;
         renderTopics(allTopics);
+        updateTopicsCount();
         document.querySelector('.loader').style.display = 'none';
     } catch (error) {
         document.querySelector('.loader').innerHTML = `
@@ -195,6 +219,19 @@ async function showTopic(id, li) {
     }
 }
 
+// Server bergan variantlardan <source> teglari (WebP avval, JPEG zaxira)
+function renderImageSources(srcset) {
+    if (!srcset || !srcset.length) return '';
+    const byType = {};
+    srcset.forEach(v => {
+        (byType[v.type] = byType[v.type] || []).push(`${v.url} ${v.width}w`);
+    });
+    return ['image/webp', 'image/jpeg']
+        .filter(type => byType[type])
+        .map(type => `<source type="${type}" srcset="${byType[type].join(', ')}" sizes="(max-width: 992px) 100vw, 66vw">`)
+        .join('');
+}
+
 function formatTopicContent(topic) {
     return `
         <div class="topic-card">
@@ -206,6 +243,8 @@ function formatTopicContent(topic) {
             <div class="topic-media">
                 ${topic.image_url ? `
                     <div class="image-container">
+                        <picture>
+                        ${renderImageSources(topic.image_srcset)}
                         <img src="${topic.image_url}" 
                              alt="Rasm" 
                              loading="lazy"
@@ -213,6 +252,7 @@ function formatTopicContent(topic) {
                              onerror="this.onerror=null; this.src='/static/img/placeholder.png';"
                              class="topic-image"
                              style="max-width: 100%; height: auto;">
+                        </picture>
                         <div class="image-loader"></div>
                     </div>
                 ` : ''}
@@ -561,15 +601,25 @@ function renderFeedbackBox(feedbacks) {
 }
 
 // WebSocket connection
-const socket = io();
+// Faqat websocket: ulanish bitta TCP oqim, shuning uchun bir nechta worker ortida
+// sticky session kerak emas (long-polling so'rovlari turli workerlarga tushib qoladi)
+const socket = io({ transports: ['websocket'] });
 
 // WebSocket event handlers
 socket.on('connect', () => {
     console.log('Connected to WebSocket server');
 });
 
-socket.on('disconnect', () => {
+socket.on('disconnect', (reason) => {
     console.log('Disconnected from WebSocket server');
+    // Server o'zi uzsa (worker to'xtayapti) Socket.IO avtomatik qayta ulanmaydi;
+    // tasodifiy kechikish barcha mijozlar yangi workerga bir vaqtda ulanmasligi uchun
+    if (reason === 'io server disconnect') {
+        setTimeout(() => {
+            socket.once('connect', loadWelcomeStats);
+            socket.connect();
+        }, 500 + Math.random() * 2500);
+    }
 });
 
 socket.on('feedback_update', (data) => {
@@ -626,20 +676,8 @@ function loadWelcomeStats() {
             if (users) users.textContent = '...';
         });
 
-    // Mavzular soni
-    fetch('/api/topics')
-        .then(r => r.json())
-        .then(data => {
-            const topics = document.getElementById('stats-topics');
-            if (topics && Array.isArray(data)) {
-                topics.textContent = data.length;
-            }
-        })
-        .catch(err => {
-            console.error('Topics API error:', err);
-            const topics = document.getElementById('stats-topics');
-            if (topics) topics.textContent = '...';
-        });
+    // Mavzular soni (ro'yxat loadTopics orqali allaqachon yuklangan)
+    if (allTopics.length) updateTopicsCount();
 
     // Yangiliklar
     fetch('/api/news')
@@ -697,5 +735,6 @@ function loadWelcomeStats() {
 
 // Load stats when page loads
 document.addEventListener('DOMContentLoaded', loadWelcomeStats);
-// Update stats every 30 seconds
-setInterval(loadWelcomeStats, 30000);
\ No newline at end of file
+// Keyingi yangilanishlar socket orqali keladi (stats_update, news_update, feedback_update);
+// uzilish paytida o'tkazib yuborilganlarini qayta ulanganda bir marta olamiz
+socket.io.on('reconnect', loadWelcomeStats);
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Yuklangan fayllar uchun kontent-manzilli saqlash va bo'lakli (chunked) yuklash.
+
+Fayllar SHA-256 xeshi bo'yicha nomlanadi (<sha256>.<ext>), shuning uchun bir
+xil fayl ikkinchi marta yozilmaydi va avvalgi URL qaytariladi. Katta fayllar
+init -> PUT bo'lak -> complete protokoli orqali yuklanadi; uzilgan yuklash
+serverdagi joriy offsetdan davom ettiriladi. Hech bir bosqichda fayl to'liq
+xotiraga o'qilmaydi.
+
+Tugallanmagan fayllar statik papkadan tashqarida (partial_dir) saqlanadi va
+tayyor bo'lgach os.link bilan joylanadi - ikkala papka bitta fayl tizimida
+bo'lishi kerak.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from eventlet import tpool
+
+# Oqimdan o'qish bo'lagi
+READ_SIZE = 64 * 1024
+# Bitta PUT so'rovidagi bo'lakning maksimal hajmi (MAX_CONTENT_LENGTH dan kichik)
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+# Bo'lakli yuklashdagi umumiy fayl hajmi chegarasi
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 50 * 1024 * 1024))
+# Tugallanmagan yuklash sessiyalari shu vaqtdan keyin o'chiriladi
+STALE_SESSION_AGE = 24 * 3600
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'}
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status_code=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or {}
+
+
+def file_extension(filename):
+    """Ruxsat etilgan kengaytmani qaytarish yoki UploadError"""
+    ext = filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UploadError('Ruxsat etilmagan fayl turi')
+    return ext
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadStorage:
+    def __init__(self, root, url_prefix, partial_dir):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.partial_dir = partial_dir
+        os.makedirs(self.partial_dir, exist_ok=True)
+        # upload_id -> (xeshlangan baytlar, sha256) - bo'laklar shu jarayonga kelgan bo'lsa
+        self._digests = {}
+
+    def url_for(self, filename):
+        return f"{self.url_prefix}/{filename}"
+
+    def find(self, digest, ext):
+        """Xesh bo'yicha mavjud fayl nomini qaytarish"""
+        filename = f"{digest}.{ext}"
+        return filename if os.path.exists(os.path.join(self.root, filename)) else None
+
+    def _commit(self, tmp_path, digest, ext):
+        """Vaqtinchalik faylni xesh nomi bilan joylash; (fayl_nomi, yangi_yozildimi)"""
+        filename = f"{digest}.{ext}"
+        final_path = os.path.join(self.root, filename)
+        # os.link mavjud faylni hech qachon almashtirmaydi: parallel bir xil yuklashlardan
+        # faqat bittasi created=True oladi, berilayotgan fayl qayta yozilmaydi
+        try:
+            os.link(tmp_path, final_path)
+            created = True
+        except FileExistsError:
+            created = False
+        os.remove(tmp_path)
+        return filename, created
+
+    # --- Bir martalik yuklash ---
+    def store_stream(self, stream, ext, max_size=MAX_UPLOAD_SIZE):
+        """Oqimni diskka yozish bilan bir vaqtda xeshlash"""
+        tmp_path = os.path.join(self.partial_dir, f"{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    chunk = stream.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadError('Fayl hajmi juda katta', 413)
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, digest.hexdigest(), ext)
+
+    # --- Bo'lakli yuklash sessiyalari ---
+    def _paths(self, upload_id):
+        if not _UPLOAD_ID_RE.match(upload_id or ''):
+            raise UploadError('Yuklash ID noto\'g\'ri', 404)
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + '.json', base + '.part'
+
+    def init_session(self, filename, size):
+        ext = file_extension(filename)
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Fayl hajmi ko\'rsatilmagan')
+        if size > MAX_UPLOAD_SIZE:
+            raise UploadError('Fayl hajmi juda katta', 413)
+        self.cleanup_stale()
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump({'ext': ext, 'size': size, 'created': time.time()}, f)
+        return self.session(upload_id)
+
+    def session(self, upload_id):
+        meta_path, part_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Yuklash sessiyasi topilmadi', 404)
+        return {
+            'upload_id': upload_id,
+            'size': meta['size'],
+            'ext': meta['ext'],
+            'offset': os.path.getsize(part_path),
+            'chunk_size': MAX_CHUNK_SIZE,
+        }
+
+    @contextmanager
+    def _locked(self, upload_id, mode):
+        """.part faylini ochib eksklyuziv flock olish (jarayonlar orasida ham ishlaydi).
+
+        Kutilmaydi: shu yuklashga boshqa so'rov yozayotgan bo'lsa darhol 409.
+        """
+        info = self.session(upload_id)
+        _, part_path = self._paths(upload_id)
+        with open(part_path, mode) as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadError('Yuklash band: boshqa so\'rov yozmoqda', 409, {'offset': info['offset']})
+            # Qulf olingandan keyingi haqiqiy hajm
+            info['offset'] = os.fstat(f.fileno()).st_size
+            yield f, info
+
+    def write_chunk(self, upload_id, offset, stream, length):
+        """Bo'lakni joriy offsetga qo'shish; yangi offsetni qaytarish"""
+        meta_path, _ = self._paths(upload_id)
+        with self._locked(upload_id, 'ab') as (out, info):
+            if offset != info['offset']:
+                # Mijoz javobni yo'qotgan bo'lishi mumkin - joriy offsetdan davom etsin
+                raise UploadError('Offset mos kelmadi', 409, {'offset': info['offset']})
+            if length is None or length > MAX_CHUNK_SIZE:
+                raise UploadError('Bo\'lak hajmi noto\'g\'ri', 413)
+            if offset + length > info['size']:
+                raise UploadError('Bo\'lak fayl hajmidan oshib ketdi', 400)
+            hashed, digest = self._digests.pop(upload_id, (0, hashlib.sha256()))
+            if hashed != offset:
+                # Oldingi bo'laklar boshqa workerga tushgan - xesh complete da hisoblanadi
+                digest = None
+            written = 0
+            while True:
+                chunk = stream.read(READ_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                out.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+            if digest is not None:
+                self._digests[upload_id] = (offset + written, digest)
+        os.utime(meta_path)
+        return offset + written
+
+    def complete(self, upload_id, expected_sha256=None):
+        meta_path, part_path = self._paths(upload_id)
+        with self._locked(upload_id, 'rb') as (_, info):
+            if info['offset'] != info['size']:
+                raise UploadError('Fayl to\'liq yuklanmagan', 409, {'offset': info['offset']})
+            hashed, digest = self._digests.pop(upload_id, (None, None))
+            if hashed == info['size']:
+                digest = digest.hexdigest()
+            else:
+                # Bo'laklar bir nechta workerga tushgan: faylni hub ni to'xtatmasdan oqimda xeshlash
+                digest = tpool.execute(_hash_file, part_path)
+            if expected_sha256 and expected_sha256 != digest:
+                self.abort(upload_id)
+                raise UploadError('Fayl xeshi mos kelmadi', 422)
+            result = self._commit(part_path, digest, info['ext'])
+        os.remove(meta_path)
+        return result
+
+    def abort(self, upload_id):
+        self._digests.pop(upload_id, None)
+        for path in self._paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def cleanup_stale(self, max_age=STALE_SESSION_AGE):
+        cutoff = time.time() - max_age
+        for upload_id in list(self._digests):
+            if not os.path.exists(self._paths(upload_id)[0]):
+                self._digests.pop(upload_id, None)
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def valid_sha256(value):
+    return bool(value) and bool(_SHA256_RE.match(value))
@@ -0,0 +1,122 @@
+"""Bot xabarlarini yo'naltirish tezligi: eski handlerlar ro'yxati va router.
+
+Foydalanish (BOT kutubxonalari o'rnatilgan bo'lishi kerak):
+
+    python benchmarks/bench_dispatch.py [--updates 200000]
+
+Faqat handler tanlash o'lchanadi (handlerlar bajarilmaydi). Eski usul - PTB
+0-guruhdagi handlerlarni tartib bilan check_update qiladi, birinchi mos
+kelgani tanlanadi. Yangi usul - handlers/router.resolve.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'BOT')
+sys.path.insert(0, BOT_DIR)
+os.chdir(BOT_DIR)
+ADMIN_ID = 1
+os.environ['ADMINS'] = str(ADMIN_ID)
+
+from telegram import Chat, Contact, Message, PhotoSize, Update, User, Video  # noqa: E402
+from telegram.ext import CallbackQueryHandler, CommandHandler, MessageHandler, filters  # noqa: E402
+
+from handlers import admin, router  # noqa: E402
+
+USER_ID = 2
+
+
+async def _noop(update, context):
+    pass
+
+
+def legacy_handlers():
+    """Router kiritilishidan oldingi start_bot() dagi 0-guruh ro'yxati"""
+    return [
+        CommandHandler("start", _noop),
+        MessageHandler(filters.Regex("^📊 Statistika$"), _noop),
+        MessageHandler(filters.Regex("^➕ Yangi mavzu qo'shish$"), _noop),
+        MessageHandler(filters.Regex("^🗑 Mavzuni o'chirish$"), _noop),
+        CallbackQueryHandler(_noop, pattern=r"^delete_topic_\d+$"),
+        MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.UpdateType.EDITED_MESSAGE, _noop),
+        MessageHandler(filters.PHOTO, _noop),
+        MessageHandler(filters.VIDEO, _noop),
+        MessageHandler(filters.Regex("^⏭ O'tkazib yuborish$"), _noop),
+        MessageHandler(filters.Regex("^✅ Saqlash$"), _noop),
+        MessageHandler(filters.CONTACT, _noop),
+        MessageHandler(filters.TEXT & ~filters.COMMAND, _noop),
+        MessageHandler(filters.PHOTO, _noop),
+        MessageHandler(filters.VIDEO, _noop),
+    ]
+
+
+def make_update(update_id, user_id, **message_kwargs):
+    user = User(user_id, 'Test', False)
+    message = Message(update_id, datetime.now(), Chat(user_id, Chat.PRIVATE), from_user=user, **message_kwargs)
+    return Update(update_id, message=message)
+
+
+def sample_updates():
+    """Odatiy aralashma: (update, user_data)"""
+    photo = [PhotoSize('p', 'p', 1280, 720, file_size=100000)]
+    video = Video('v', 'v', 1280, 720, 10, file_size=1000000)
+    contact = Contact('+998900000000', 'Test', user_id=USER_ID)
+    step = {name: i for i, name in enumerate(admin.TOPIC_STEPS)}
+
+    def wizard(state):
+        return {'topic': {}, 'topic_step': step.get(state, len(admin.TOPIC_STEPS))}
+
+    cases = [
+        (ADMIN_ID, {'text': admin.STATS_BTN}, {}),
+        (ADMIN_ID, {'text': admin.NEW_TOPIC_BTN}, {}),
+        (ADMIN_ID, {'text': 'Mavzu nomi'}, wizard('title')),
+        (ADMIN_ID, {'text': 'Tuzilma matni'}, wizard('structure')),
+        (ADMIN_ID, {'text': 'Misollar'}, wizard('examples')),
+        (ADMIN_ID, {'photo': photo}, wizard('image')),
+        (ADMIN_ID, {'text': admin.SKIP_BTN}, wizard('video')),
+        (ADMIN_ID, {'video': video}, wizard('video')),
+        (ADMIN_ID, {'text': admin.SAVE_BTN}, wizard(admin.CONFIRM_STATE)),
+        (ADMIN_ID, {'text': admin.CANCEL_BTN}, wizard('title')),
+        (USER_ID, {'contact': contact}, {}),
+        (USER_ID, {'text': 'salom'}, {}),
+    ]
+    return [(make_update(i + 1, user_id, **kwargs), user_data) for i, (user_id, kwargs, user_data) in enumerate(cases)]
+
+
+def bench_legacy(samples, n):
+    handlers = legacy_handlers()
+    start = time.perf_counter()
+    for i in range(n):
+        update = samples[i % len(samples)][0]
+        for handler in handlers:
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                break
+    return n / (time.perf_counter() - start)
+
+
+def bench_router(samples, n):
+    start = time.perf_counter()
+    for i in range(n):
+        update, user_data = samples[i % len(samples)]
+        router.resolve(update, user_data)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=200000)
+    args = parser.parse_args()
+
+    samples = sample_updates()
+    legacy = bench_legacy(samples, args.updates)
+    routed = bench_router(samples, args.updates)
+    print(f'Eski handlerlar ro\'yxati: {legacy:,.0f} update/s')
+    print(f'Router (lug\'at):          {routed:,.0f} update/s')
+    print(f'Tezlashish: {routed / legacy:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Rolling reload paytida so'rovlar uzilmasligini tekshirish.
+
+Foydalanish (WEB-APP/.env dagi DATABASE_URL ishlatiladi):
+
+    python benchmarks/bench_reload.py [--workers 2] [--reloads 3] [--clients 8]
+
+Supervisor faqat web workerlar bilan ishga tushiriladi, yuk generatori
+/api/topics ga uzluksiz so'rov yuboradi va har bir bosqichda supervisorga
+SIGHUP yuboriladi. Reload /ready dagi pid lar to'liq almashganda tugagan
+hisoblanadi. Natijada muvaffaqiyatli so'rovlar va xatolar soni chiqadi -
+xatolar 0 bo'lishi kerak.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = '127.0.0.1'
+PATH = '/api/topics?fields=id,title&limit=20'
+TIMEOUT = 120
+
+
+def worker_pid(port):
+    try:
+        with urllib.request.urlopen(f'http://{HOST}:{port}/ready', timeout=2) as resp:
+            return json.loads(resp.read())['pid']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def wait_pids(ports, changed_from=None):
+    """Barcha portlar javob berguncha (va pid lar changed_from dan farq qilguncha) kutish"""
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        pids = [worker_pid(port) for port in ports]
+        if all(pids) and (changed_from is None or not set(pids) & set(changed_from)):
+            return pids
+        time.sleep(0.5)
+    raise RuntimeError('workerlar o\'z vaqtida tayyor bo\'lmadi')
+
+
+def load(ports, stop, stats, lock):
+    i = 0
+    while not stop.is_set():
+        port = ports[i % len(ports)]
+        i += 1
+        try:
+            urllib.request.urlopen(f'http://{HOST}:{port}{PATH}', timeout=10).read()
+            key = 'ok'
+        except (OSError, urllib.error.HTTPError):
+            key = 'errors'
+        with lock:
+            stats[key] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--reloads', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5200)
+    args = parser.parse_args()
+
+    ports = [args.port + i for i in range(args.workers)]
+    code = (
+        'import logging, sys, supervisor; logging.basicConfig(level=logging.INFO); '
+        f'supervisor.run(supervisor.build_services(sys.executable, {args.workers}, {args.port}, {HOST!r}, bot=False))'
+    )
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR)
+    stop = threading.Event()
+    stats = {'ok': 0, 'errors': 0}
+    lock = threading.Lock()
+    try:
+        pids = wait_pids(ports)
+        clients = [threading.Thread(target=load, args=(ports, stop, stats, lock)) for _ in range(args.clients)]
+        for client in clients:
+            client.start()
+        for n in range(args.reloads):
+            started = time.monotonic()
+            proc.send_signal(signal.SIGHUP)
+            pids = wait_pids(ports, changed_from=pids)
+            print(f'reload {n + 1}: {time.monotonic() - started:.1f}s, yangi pid lar {pids}')
+        stop.set()
+        for client in clients:
+            client.join()
+    finally:
+        stop.set()
+        proc.terminate()
+        proc.wait()
+    print(f"so'rovlar: {stats['ok']}, xatolar: {stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Ishga tushish vaqti: main.py sozlash bosqichi, web worker va bot.
+
+Foydalanish (loyiha ildizida, .env tayyor bo'lsa):
+
+    python benchmarks/bench_startup.py [--runs 3] [--skip-bot]
+
+- setup: main.setup() - venv, .env nusxalari, pip va init-db. Birinchi
+  o'lchov "sovuq" bo'lishi mumkin, keyingilari barmoq izlari mos kelgani
+  uchun soniyalar ichida tugashi kerak;
+- web: `python app.py` ishga tushganidan /health 200 qaytarguncha;
+- bot: `python run.py` ishga tushganidan BOT/data/heartbeat yangilanguncha
+  (BOT_TOKEN va Telegram tarmog'i kerak).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import main as launcher  # noqa: E402
+import supervisor  # noqa: E402
+
+HOST = '127.0.0.1'
+PORT = 5199
+TIMEOUT = 120
+HEARTBEAT = os.path.join(BASE_DIR, 'BOT', 'data', 'heartbeat')
+
+
+def time_setup():
+    started = time.perf_counter()
+    python_path = launcher.setup()
+    return time.perf_counter() - started, python_path
+
+
+async def _wait_ready(probe, process):
+    started = time.perf_counter()
+    deadline = started + TIMEOUT
+    while not await probe():
+        if process.poll() is not None:
+            raise RuntimeError(f'jarayon {process.returncode} kodi bilan tugadi')
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f'{TIMEOUT}s ichida tayyor bo\'lmadi')
+        await asyncio.sleep(0.05)
+    return time.perf_counter() - started
+
+
+def time_process(command, cwd, probe, env=None):
+    process = subprocess.Popen(
+        command, cwd=cwd, env=dict(os.environ, PYTHONUNBUFFERED='1', **(env or {})),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        return asyncio.run(_wait_ready(probe, process))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def time_web(python_path):
+    return time_process(
+        [python_path, 'app.py'], os.path.join(BASE_DIR, 'WEB-APP'),
+        lambda: supervisor.http_probe(HOST, PORT, timeout=1),
+        env={'PORT': str(PORT), 'HOST': HOST},
+    )
+
+
+def time_bot(python_path):
+    # Eski heartbeat hisobga olinmasligi uchun faqat yangi yozilgani kutiladi
+    since = time.time()
+
+    async def probe():
+        try:
+            return os.path.getmtime(HEARTBEAT) >= since
+        except OSError:
+            return False
+    return time_process([python_path, 'run.py'], os.path.join(BASE_DIR, 'BOT'), probe)
+
+
+def report(name, samples):
+    print(f'{name:>6}: ' + ', '.join(f'{s:.2f}s' for s in samples)
+          + f'  (mediana {statistics.median(samples):.2f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--skip-bot', action='store_true')
+    args = parser.parse_args()
+
+    setup_times = []
+    for _ in range(args.runs):
+        elapsed, python_path = time_setup()
+        setup_times.append(elapsed)
+    report('setup', setup_times)
+    report('web', [time_web(python_path) for _ in range(args.runs)])
+    if not args.skip_bot:
+        report('bot', [time_bot(python_path) for _ in range(args.runs)])
+
+
+if __name__ == '__main__':
+    main()
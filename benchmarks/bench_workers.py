@@ -0,0 +1,146 @@
+"""Web ilova o'tkazuvchanligi worker soniga qarab: 1, 2, 4 ... worker.
+
+Foydalanish (WEB-APP/.env dagi DATABASE_URL va REDIS_URL ishlatiladi):
+
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--duration 10] [--clients 32]
+
+Har bir o'lchov uchun N ta `python app.py` jarayoni PORT, PORT+1, ... da
+ishga tushiriladi va yuk generatori so'rovlarni ular orasida navbat bilan
+taqsimlaydi (load balancer o'rniga). Yuk generatori ham alohida jarayonlarda
+ishlaydi, shuning uchun o'zi cheklov bo'lib qolmaydi.
+
+REDIS_URL berilgan va python-socketio mijozi o'rnatilgan bo'lsa, Socket.IO
+emit lari workerlar orasida yetib borishi ham tekshiriladi: mijoz 0-workerga
+ulanadi, yangilik esa oxirgi workerga yuboriladi.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from dotenv import load_dotenv
+
+WEB_APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WEB-APP')
+load_dotenv(os.path.join(WEB_APP_DIR, '.env'))
+HOST = '127.0.0.1'
+PATH = '/api/topics?fields=id,title&limit=50'
+READY_TIMEOUT = 60
+
+
+def start_workers(n, base_port):
+    workers = []
+    for i in range(n):
+        env = dict(os.environ, PORT=str(base_port + i), HOST=HOST, PYTHONUNBUFFERED='1')
+        workers.append(subprocess.Popen(
+            [sys.executable, 'app.py'], cwd=WEB_APP_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+    deadline = time.monotonic() + READY_TIMEOUT
+    for i in range(n):
+        while True:
+            try:
+                urllib.request.urlopen(f'http://{HOST}:{base_port + i}/health', timeout=2)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    stop_workers(workers)
+                    raise RuntimeError(f'worker {i} tayyor bo\'lmadi')
+                time.sleep(0.5)
+    return workers
+
+
+def stop_workers(workers):
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+def _client(ports, duration, offset, counter):
+    """Keep-alive ulanishlar bilan so'rovlarni portlar orasida aylantirish"""
+    conns = {port: http.client.HTTPConnection(HOST, port, timeout=10) for port in ports}
+    done = 0
+    i = offset
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        port = ports[i % len(ports)]
+        i += 1
+        try:
+            conns[port].request('GET', PATH)
+            conns[port].getresponse().read()
+            done += 1
+        except (OSError, http.client.HTTPException):
+            conns[port].close()
+            conns[port] = http.client.HTTPConnection(HOST, port, timeout=10)
+    with counter.get_lock():
+        counter.value += done
+
+
+def run_load(ports, duration, clients):
+    counter = multiprocessing.Value('i', 0)
+    procs = [
+        multiprocessing.Process(target=_client, args=(ports, duration, offset, counter))
+        for offset in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return counter.value / duration
+
+
+def check_fanout(base_port, n):
+    """0-workerga ulangan mijoz oxirgi workerdagi emit ni olishini tekshirish"""
+    try:
+        import socketio
+    except ImportError:
+        return 'o\'tkazildi (python-socketio mijozi yo\'q)'
+    received = threading.Event()
+    client = socketio.Client()
+    client.on('news_update', lambda data: received.set())
+    client.connect(f'http://{HOST}:{base_port}', transports=['websocket'])
+    try:
+        req = urllib.request.Request(
+            f'http://{HOST}:{base_port + n - 1}/api/news',
+            data=b'{"title": "bench fan-out", "content": ""}',
+            headers={'Content-Type': 'application/json'},
+        )
+        urllib.request.urlopen(req, timeout=10).read()
+        return 'OK' if received.wait(5) else 'XATO: emit boshqa workerga yetib bormadi (REDIS_URL?)'
+    finally:
+        client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--port', type=int, default=5100)
+    args = parser.parse_args()
+
+    baseline = None
+    for n in args.workers:
+        workers = start_workers(n, args.port)
+        try:
+            ports = [args.port + i for i in range(n)]
+            run_load(ports, 1, args.clients)  # qizdirish (kesh, ulanishlar puli)
+            rps = run_load(ports, args.duration, args.clients)
+            baseline = baseline or rps
+            print(f'{n} worker: {rps:,.0f} so\'rov/s ({rps / baseline:.2f}x)')
+            if n > 1 and os.getenv('REDIS_URL'):
+                print(f'   Socket.IO fan-out: {check_fanout(args.port, n)}')
+        finally:
+            stop_workers(workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Web ilovadagi eng ko'p ishlatiladigan so'rovlar uchun EXPLAIN va vaqt o'lchovi.
+
+Foydalanish (WEB-APP/.env dagi DATABASE_URL ishlatiladi):
+
+    python benchmarks/explain_queries.py            # joriy sxema
+    python benchmarks/explain_queries.py --compare  # indekslarsiz va indekslar bilan
+
+--compare faqat 2-migratsiya (indekslar) ning down/up funksiyalarini
+chaqiradi: indekslarni vaqtincha o'chiradi, so'rovlarni o'lchaydi, keyin
+qayta yaratadi. Boshqa migratsiyalar va schema_migrations o'zgarmaydi.
+Faqat sinov bazasida ishlating.
+"""
+import argparse
+import os
+import sys
+import time
+
+WEB_APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WEB-APP')
+sys.path.insert(0, WEB_APP_DIR)
+os.chdir(WEB_APP_DIR)
+
+from sqlalchemy import text  # noqa: E402
+
+import app as webapp  # noqa: E402
+from migrations import MIGRATIONS  # noqa: E402
+
+RUNS = 20
+INDEX_MIGRATION = 2
+
+
+def hot_queries():
+    Topic, News, Feedback, Contact = webapp.Topic, webapp.News, webapp.Feedback, webapp.Contact
+    some_topic = Topic.query.order_by(Topic.id).first()
+    topic_id = some_topic.id if some_topic else 1
+    return {
+        'topics page': Topic.query.order_by(Topic.created_at.desc(), Topic.id.desc()).limit(51),
+        'news latest': Topic.query.order_by(Topic.created_at.desc()).limit(3),
+        'news table': News.query.order_by(News.created_at.desc()).limit(10),
+        'feedback page': webapp.feedback_query().order_by(Feedback.created_at.desc(), Feedback.id.desc()).limit(6),
+        'feedback by topic': Feedback.query.filter(Feedback.topic_id == topic_id).order_by(Feedback.created_at.desc()).limit(20),
+        'contact lookup': Contact.query.filter(Contact.user_id == 1),
+    }
+
+
+def compile_sql(query):
+    return str(query.statement.compile(
+        dialect=webapp.db.engine.dialect,
+        compile_kwargs={'literal_binds': True}
+    ))
+
+
+def measure(label):
+    print(f'\n===== {label} =====')
+    for name, query in hot_queries().items():
+        sql = compile_sql(query)
+        plan = webapp.db.session.execute(text(f'EXPLAIN {sql}')).mappings().all()
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            webapp.db.session.execute(text(sql)).fetchall()
+        elapsed = (time.perf_counter() - start) / RUNS * 1000
+        print(f'\n-- {name}: {elapsed:.2f} ms/so\'rov')
+        for row in plan:
+            print('   ', {k: row[k] for k in ('table', 'type', 'key', 'rows', 'Extra') if k in row})
+    webapp.db.session.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compare', action='store_true', help='indekslarsiz va indekslar bilan solishtirish')
+    args = parser.parse_args()
+
+    with webapp.app.app_context():
+        if args.compare:
+            _, _, up, down = next(m for m in MIGRATIONS if m[0] == INDEX_MIGRATION)
+            engine = webapp.db.engine
+            with engine.begin() as conn:
+                down(conn)
+            try:
+                measure('oldin (indekslarsiz)')
+            finally:
+                # O'lchov xato bilan tugasa ham indekslar qaytariladi
+                with engine.begin() as conn:
+                    up(conn)
+            measure('keyin (indekslar bilan)')
+        else:
+            measure('joriy sxema')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,12 @@ import subprocess
 import sys
 import os
 import shutil
-from threading import Thread
-import time
+import filecmp
+import hashlib
 from dotenv import load_dotenv
-import signal
-import atexit
 import logging
 from logging.handlers import RotatingFileHandler
+import supervisor
 
 # Log yozish sozlamalari
 if not os.path.exists('logs'):
@@ -25,31 +24,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-processes = []
-
-def cleanup():
-    """Cleanup function to terminate all processes"""
-    logger.info("Cleaning up processes...")
-    for process in processes:
-        if process and process.poll() is None:
-            logger.info(f"Terminating process {process.pid}")
-            process.terminate()
-            try:
-                process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                logger.warning(f"Process {process.pid} did not terminate gracefully, killing...")
-                process.kill()
-                process.wait()
-
-def signal_handler(signum, frame):
-    """Handle termination signals"""
-    logger.info(f"Received signal {signum}, shutting down...")
-    cleanup()
-    sys.exit(0)
+VENV_DIR = os.path.join(BASE_DIR, "venv")
+# Stamp files inside the venv: setup is skipped while the fingerprint matches
+REQUIREMENTS_STAMP = os.path.join(VENV_DIR, ".requirements.sha256")
+DB_STAMP = os.path.join(VENV_DIR, ".init-db.sha256")
 
 def setup_virtual_env():
     """Virtual environment setup"""
-    venv_name = os.path.join(BASE_DIR, "venv")
+    venv_name = VENV_DIR
     if not os.path.exists(venv_name):
         logger.info("Creating virtual environment...")
         subprocess.run([sys.executable, '-m', 'venv', venv_name], check=True)
@@ -83,79 +65,89 @@ def setup_env():
     if not os.path.exists(env_source):
         raise FileNotFoundError("Main .env file not found!")
 
-    shutil.copy(env_source, bot_env_path)
-    shutil.copy(env_source, web_env_path)
+    for target in (bot_env_path, web_env_path):
+        if os.path.exists(target) and filecmp.cmp(env_source, target, shallow=False):
+            continue
+        shutil.copy(env_source, target)
+        logger.info(f"Updated {target}")
     logger.info("Environment files set up successfully")
 
-def install_requirements(pip_path):
-    """Install required packages"""
+def fingerprint(*parts):
+    """sha256 over file contents (paths) and plain strings"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if os.path.isfile(part):
+            with open(part, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def read_stamp(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_stamp(path, value):
+    with open(path, 'w') as f:
+        f.write(value)
+
+def install_requirements(python_path, pip_path):
+    """Install required packages unless requirements.txt and the interpreter are unchanged"""
+    requirements = os.path.join(BASE_DIR, 'requirements.txt')
+    # The venv interpreter must still exist - upgrading the base Python breaks it
+    current = fingerprint(requirements, sys.version, os.path.realpath(sys.executable))
+    if os.path.exists(python_path) and read_stamp(REQUIREMENTS_STAMP) == current:
+        logger.info("Requirements unchanged, skipping pip install")
+        return
     logger.info("Installing requirements...")
     try:
-        subprocess.run([pip_path, 'install', '-r', os.path.join(BASE_DIR, 'requirements.txt')], check=True)
+        subprocess.run([pip_path, 'install', '-r', requirements], check=True)
         logger.info("Requirements installed successfully")
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to install requirements: {e}")
         raise
-
-def run_process(name, command, cwd):
-    """Run a process with proper error handling"""
-    try:
-        logger.info(f"Starting {name}...")
-        process = subprocess.Popen(
-            command,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-        processes.append(process)
-        return process
-    except Exception as e:
-        logger.error(f"Failed to start {name}: {e}")
-        raise
-
-def monitor_process(process, name, command, cwd):
-    """Monitor a process and restart if it fails"""
-    while True:
-        if process.poll() is not None:
-            logger.error(f"{name} stopped unexpectedly with code {process.returncode}")
-            logger.info(f"Restarting {name}...")
-            # Restart process
-            new_process = run_process(name, command, cwd)
-            process = new_process
-        time.sleep(5)
+    write_stamp(REQUIREMENTS_STAMP, current)
+
+def init_database(python_path):
+    """Create the database and apply migrations once per schema/DATABASE_URL change"""
+    web_dir = os.path.join(BASE_DIR, 'WEB-APP')
+    # app.py holds the models that create_all() builds
+    current = fingerprint(
+        os.path.join(web_dir, 'app.py'),
+        os.path.join(web_dir, 'migrations.py'),
+        os.getenv('DATABASE_URL', ''),
+    )
+    if read_stamp(DB_STAMP) == current:
+        logger.info("Database schema unchanged, skipping init-db")
+        return
+    logger.info("Initializing database...")
+    subprocess.run([python_path, '-m', 'flask', '--app', 'app', 'init-db'], cwd=web_dir, check=True)
+    write_stamp(DB_STAMP, current)
+
+def setup():
+    """Prepare venv, env files and database; returns the venv python path"""
+    python_path, pip_path = setup_virtual_env()
+    check_directories()
+    setup_env()
+    install_requirements(python_path, pip_path)
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+    init_database(python_path)
+    return python_path
 
 if __name__ == '__main__':
     try:
-        # Signal handlers
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
-        atexit.register(cleanup)
-
-        # Setup
-        python_path, pip_path = setup_virtual_env()
-        check_directories()
-        setup_env()
-        install_requirements(pip_path)
-
-        # Start processes
-        bot_command = [python_path, 'run.py']
-        bot_cwd = os.path.join(BASE_DIR, 'BOT')
-        bot_process = run_process("Bot", bot_command, bot_cwd)
-        time.sleep(2)  # Wait for bot to start
-        web_command = [python_path, 'app.py']
-        web_cwd = os.path.join(BASE_DIR, 'WEB-APP')
-        web_process = run_process("Web App", web_command, web_cwd)
-
-        # Start monitoring threads
-        Thread(target=monitor_process, args=(bot_process, "Bot", bot_command, bot_cwd), daemon=True).start()
-        Thread(target=monitor_process, args=(web_process, "Web App", web_command, web_cwd), daemon=True).start()
-
-        # Keep main thread alive
-        while True:
-            time.sleep(1)
-
+        python_path = setup()
     except Exception as e:
         logger.error(f"Fatal error: {e}")
-        cleanup()
         sys.exit(1)
+
+    # Bot and web workers run under the asyncio supervisor until SIGINT/SIGTERM
+    supervisor.run(supervisor.build_services(
+        python_path,
+        web_workers=int(os.getenv('WEB_WORKERS', 1)),
+        base_port=int(os.getenv('PORT', 5000)),
+    ))
@@ -0,0 +1,438 @@
+"""Asyncio supervisor for the bot and web app processes.
+
+- Every child's stdout/stderr is read line by line into a rotating
+  logs/<service>.log, so a full pipe can never block the child.
+- Crashed children are restarted with jittered exponential backoff. A service
+  that crashes MAX_CRASHES times within CRASH_WINDOW is paused for
+  BREAKER_COOLDOWN.
+- Readiness is probed instead of relying on poll(): /ready for the web app,
+  a fresh heartbeat file for the bot. After PROBE_FAILURES failed probes in a
+  row the child is restarted.
+- SIGHUP performs a rolling reload of the web workers, one at a time: a new
+  child is started on the same port (SO_REUSEPORT), and once its /ready
+  answers with its own pid the old child gets SIGTERM and drains in-flight
+  requests and sockets for up to DRAIN_TIMEOUT before it is killed.
+- Restart, reload and breaker counters are served in the Prometheus text
+  format on SUPERVISOR_METRICS_PORT (default 9100, 0 disables).
+
+Only the standard library is used: the supervisor runs before the virtualenv exists.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+LOG_DIR = os.path.join(BASE_DIR, 'logs')
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# A child that ran this long counts as stable and its backoff is reset
+STABLE_AFTER = 60
+CRASH_WINDOW = 300
+MAX_CRASHES = 5
+BREAKER_COOLDOWN = 600
+READY_TIMEOUT = 60
+PROBE_INTERVAL = 10
+PROBE_FAILURES = 3
+STOP_TIMEOUT = 10
+# Web workers drain on SIGTERM; they get this long before being killed
+DRAIN_TIMEOUT = float(os.getenv('DRAIN_TIMEOUT', 30))
+# The bot is considered dead once its heartbeat file is older than this
+HEARTBEAT_STALE = 60
+LINE_LIMIT = 1024 * 1024
+METRICS_HOST = os.getenv('SUPERVISOR_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('SUPERVISOR_METRICS_PORT', 9100))
+
+
+def service_logger(name):
+    """Separate rotating log file for a service's output"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log = logging.getLogger(f'service.{name}')
+    if not log.handlers:
+        handler = RotatingFileHandler(os.path.join(LOG_DIR, f'{name}.log'), maxBytes=10 * 1024 * 1024, backupCount=5)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
+
+
+async def http_probe(host, port, path='/health', timeout=5, expect_pid=None):
+    """True if a GET returns 200 (and, with expect_pid, was answered by that process)"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode('ascii'))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(64 * 1024), timeout)
+        parts = response.split(b'\r\n', 1)[0].split()
+        if len(parts) < 2 or parts[1] != b'200':
+            return False
+        if expect_pid is None:
+            return True
+        body = response.split(b'\r\n\r\n', 1)[-1]
+        return json.loads(body).get('pid') == expect_pid
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return False
+    finally:
+        writer.close()
+
+
+def ready_probe(host, port):
+    """Probe a web worker's /ready; old and new workers share the port during a reload"""
+    return lambda process: http_probe(host, port, '/ready', expect_pid=process.pid)
+
+
+def heartbeat_probe(path, stale=HEARTBEAT_STALE):
+    async def probe(process):
+        try:
+            return time.time() - os.path.getmtime(path) < stale
+        except OSError:
+            return False
+    return probe
+
+
+class Service:
+    def __init__(self, name, command, cwd, env=None, probe=None, reloadable=False, stop_timeout=STOP_TIMEOUT):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.env = env or {}
+        # probe(process) -> awaitable bool
+        self.probe = probe
+        self.reloadable = reloadable
+        self.stop_timeout = stop_timeout
+        self.process = None
+        self.ready = False
+        self.crashes = deque()
+        # Counters for /metrics
+        self.restarts = 0
+        self.reloads = 0
+        self.breaker_trips = 0
+        self.watch = None
+        # process -> output pump task
+        self.pumps = {}
+        self.log = service_logger(name)
+
+
+class Supervisor:
+    def __init__(self, services):
+        self.services = services
+        self._stopping = asyncio.Event()
+        self._reload_task = None
+        # SIGHUP received during a reload: run once more afterwards to pick up the newest code
+        self._reload_pending = False
+        self.failed_reloads = 0
+
+    def render_metrics(self):
+        """Prometheus text exposition format"""
+        lines = []
+        series = [
+            ('supervisor_restarts_total', 'counter', 'Restarts after a crash or failed probe', 'restarts'),
+            ('supervisor_reloads_total', 'counter', 'Successful rolling replacements', 'reloads'),
+            ('supervisor_breaker_trips_total', 'counter', 'Crash-loop breaker activations', 'breaker_trips'),
+            ('supervisor_service_up', 'gauge', '1 if the service passed its readiness probe', 'ready'),
+        ]
+        for name, kind, help_text, attr in series:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for service in self.services:
+                lines.append(f'{name}{{service="{service.name}"}} {int(getattr(service, attr))}')
+        lines.append('# HELP supervisor_failed_reloads_total Rolling reloads aborted by a worker that never became ready')
+        lines.append('# TYPE supervisor_failed_reloads_total counter')
+        lines.append(f'supervisor_failed_reloads_total {self.failed_reloads}')
+        return '\n'.join(lines) + '\n'
+
+    async def _serve_metrics(self, reader, writer):
+        try:
+            # Request line and headers are not needed - every path returns the metrics
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+            body = self.render_metrics().encode('utf-8')
+            writer.write(
+                b'HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body
+            )
+            await writer.drain()
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def start_metrics(self, host=METRICS_HOST, port=METRICS_PORT):
+        if not port:
+            return None
+        try:
+            server = await asyncio.start_server(self._serve_metrics, host, port)
+        except OSError as e:
+            logger.error(f"Metrics server on {host}:{port} failed to start: {e}")
+            return None
+        logger.info(f"Metrics on http://{host}:{port}/metrics")
+        return server
+
+    async def run(self):
+        await asyncio.gather(*(self._supervise(service) for service in self.services))
+        if self._reload_task is not None:
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+
+    def stop(self):
+        logger.info("Shutting down services...")
+        self._stopping.set()
+
+    def request_reload(self):
+        if self._reload_task is not None and not self._reload_task.done():
+            logger.info("Reload already in progress, another one will follow")
+            self._reload_pending = True
+            return
+        self._reload_task = asyncio.ensure_future(self._reload_loop())
+
+    async def _reload_loop(self):
+        while True:
+            self._reload_pending = False
+            await self.reload()
+            if not self._reload_pending or self._stopping.is_set():
+                return
+
+    async def reload(self):
+        """Replace reloadable services one at a time; stops at the first failure"""
+        logger.info("Rolling reload started")
+        for service in self.services:
+            if not service.reloadable or service.process is None or service.process.returncode is not None:
+                continue
+            if self._stopping.is_set():
+                return
+            if not await self._replace(service):
+                if self._stopping.is_set():
+                    # Shutdown interrupted the reload - not a failed reload
+                    logger.info("Rolling reload cancelled by shutdown")
+                    return
+                logger.error("Rolling reload aborted")
+                self.failed_reloads += 1
+                return
+        logger.info("Rolling reload finished")
+
+    async def _replace(self, service):
+        """Start a new child next to the old one, switch once it is ready, drain the old one"""
+        old = service.process
+        try:
+            process = await self._spawn(service)
+        except OSError as e:
+            logger.error(f"Failed to start new {service.name}: {e}")
+            return False
+        self._start_pump(service, process)
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not await service.probe(process):
+            if process.returncode is not None or time.monotonic() > deadline or self._stopping.is_set():
+                logger.error(f"New {service.name} (pid {process.pid}) did not become ready, keeping the old one")
+                await self._terminate(process, service.stop_timeout)
+                return False
+            await asyncio.sleep(0.5)
+        if self._stopping.is_set():
+            # _supervise is already stopping the old child; do not leave the new one behind
+            await self._terminate(process, service.stop_timeout)
+            return False
+        if service.process is not old or old.returncode is not None:
+            # The old child died meanwhile and is already being restarted
+            logger.error(f"{service.name} exited during reload, discarding pid {process.pid}")
+            await self._terminate(process, service.stop_timeout)
+            return False
+        service.watch.cancel()
+        service.process = process
+        service.watch = asyncio.ensure_future(self._watch(service, process))
+        service.reloads += 1
+        logger.info(f"{service.name} switched to pid {process.pid}, draining pid {old.pid}")
+        await self._terminate(old, service.stop_timeout)
+        return True
+
+    async def _sleep(self, seconds):
+        """Sleep that wakes early on stop; returns True if stopping"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _spawn(self, service):
+        env = dict(os.environ, PYTHONUNBUFFERED='1', **service.env)
+        process = await asyncio.create_subprocess_exec(
+            *service.command,
+            cwd=service.cwd,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=LINE_LIMIT,
+        )
+        logger.info(f"Started {service.name} (pid {process.pid})")
+        return process
+
+    def _start_pump(self, service, process):
+        pump = asyncio.ensure_future(self._pump(service, process))
+        service.pumps[process] = pump
+        pump.add_done_callback(lambda _: service.pumps.pop(process, None))
+
+    async def _pump(self, service, process):
+        """Copy the child's output line by line into the service log"""
+        while True:
+            try:
+                line = await process.stdout.readline()
+            except ValueError:
+                # Line longer than LINE_LIMIT - log what we have
+                line = await process.stdout.read(LINE_LIMIT)
+            if not line:
+                break
+            service.log.info(line.decode('utf-8', 'replace').rstrip())
+
+    async def _watch(self, service, process):
+        """Wait for readiness, then probe periodically; stop the child if it stops answering"""
+        if service.probe is None:
+            service.ready = True
+            return
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not await service.probe(process):
+            if time.monotonic() > deadline:
+                logger.error(f"{service.name} not ready within {READY_TIMEOUT}s")
+                await self._terminate(process, service.stop_timeout)
+                return
+            await asyncio.sleep(1)
+        service.ready = True
+        logger.info(f"{service.name} is ready")
+        failures = 0
+        while process.returncode is None:
+            await asyncio.sleep(PROBE_INTERVAL)
+            if await service.probe(process):
+                failures = 0
+                continue
+            failures += 1
+            logger.warning(f"{service.name} failed probe ({failures}/{PROBE_FAILURES})")
+            if failures >= PROBE_FAILURES:
+                logger.error(f"{service.name} is unresponsive, restarting")
+                await self._terminate(process, service.stop_timeout)
+                return
+
+    async def _terminate(self, process, timeout=STOP_TIMEOUT):
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Process {process.pid} did not terminate gracefully, killing...")
+            process.kill()
+            await process.wait()
+
+    def _backoff(self, service, now):
+        """Delay before the next start; BREAKER_COOLDOWN when crash-looping"""
+        while service.crashes and service.crashes[0] < now - CRASH_WINDOW:
+            service.crashes.popleft()
+        if len(service.crashes) >= MAX_CRASHES:
+            logger.critical(
+                f"{service.name} crashed {len(service.crashes)} times in {CRASH_WINDOW}s, "
+                f"pausing for {BREAKER_COOLDOWN}s"
+            )
+            service.crashes.clear()
+            service.breaker_trips += 1
+            return BREAKER_COOLDOWN
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (len(service.crashes) - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def _supervise(self, service):
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                process = await self._spawn(service)
+            except OSError as e:
+                logger.error(f"Failed to start {service.name}: {e}")
+                process = None
+            if process is not None:
+                service.process = process
+                self._start_pump(service, process)
+                service.watch = asyncio.ensure_future(self._watch(service, process))
+                # A rolling reload swaps service.process; keep following the current child
+                while True:
+                    current = service.process
+                    stop = asyncio.ensure_future(self._stopping.wait())
+                    await asyncio.wait({asyncio.ensure_future(current.wait()), stop}, return_when=asyncio.FIRST_COMPLETED)
+                    stop.cancel()
+                    if self._stopping.is_set() or service.process is current:
+                        break
+                service.watch.cancel()
+                process = service.process
+                await self._terminate(process, service.stop_timeout)
+                pump = service.pumps.get(process)
+                if pump is not None:
+                    await pump
+                service.ready = False
+                if self._stopping.is_set():
+                    logger.info(f"{service.name} stopped")
+                    return
+                logger.error(f"{service.name} stopped unexpectedly with code {process.returncode}")
+            service.restarts += 1
+            now = time.monotonic()
+            if now - started >= STABLE_AFTER:
+                service.crashes.clear()
+            service.crashes.append(now)
+            delay = self._backoff(service, now)
+            logger.info(f"Restarting {service.name} in {delay:.1f}s")
+            if await self._sleep(delay):
+                return
+
+
+def build_services(python_path, web_workers=1, base_port=5000, host='127.0.0.1', bot=True):
+    services = []
+    if bot:
+        services.append(Service(
+            'bot',
+            [python_path, 'run.py'],
+            os.path.join(BASE_DIR, 'BOT'),
+            probe=heartbeat_probe(os.path.join(BASE_DIR, 'BOT', 'data', 'heartbeat')),
+        ))
+    for i in range(web_workers):
+        port = base_port + i
+        services.append(Service(
+            f'web-{i}' if web_workers > 1 else 'web',
+            [python_path, 'app.py'],
+            os.path.join(BASE_DIR, 'WEB-APP'),
+            env={'PORT': str(port), 'HOST': host},
+            probe=ready_probe(host, port),
+            reloadable=True,
+            stop_timeout=DRAIN_TIMEOUT + 5,
+        ))
+    return services
+
+
+def run(services):
+    """Run the supervisor until SIGINT/SIGTERM; SIGHUP reloads the web workers"""
+    async def main():
+        supervisor = Supervisor(services)
+        loop = asyncio.get_running_loop()
+        handlers = [(signal.SIGINT, supervisor.stop), (signal.SIGTERM, supervisor.stop)]
+        if hasattr(signal, 'SIGHUP'):
+            handlers.append((signal.SIGHUP, supervisor.request_reload))
+        for sig, handler in handlers:
+            try:
+                loop.add_signal_handler(sig, handler)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: stopped via KeyboardInterrupt
+        metrics_server = await supervisor.start_metrics()
+        try:
+            await supervisor.run()
+        finally:
+            if metrics_server is not None:
+                metrics_server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Supervisor stopped")
+    sys.exit(0)